@@ -1,5 +1,3 @@
 # app/__init__.py
-# Import celery_app to ensure it's available for autodiscovery
-from .celery_app import celery_app
-
-__all__ = ["celery_app"]
+# DEVNOTE: intentionally empty. The worker loads Celery with `celery -A app.celery_app`,
+# the API imports it lazily on the first dispatch (app/dispatch.py).
@@ -0,0 +1,240 @@
+# --------------------------------
+# purpose: admission control: per-user/per-route token buckets + an in-flight request cap.
+# target: Cloud Task Manager API
+# --------------------------------
+
+# app/admission.py
+
+# DEVNOTE: under a big load ramp requests used to queue in the threadpool and the DB pool
+# until everyone's p95 was near the 2s k6 threshold. This middleware answers early instead:
+#   1. in-flight cap: more than admission_max_in_flight requests already running in this
+#      process -> 503 + Retry-After. Costs nothing, so it is checked first. The streams
+#      (STREAM_PATHS) don't count: the SSE feed is uncapped, exports have their own cap.
+#   2. route budget: POST /login, POST /users/ (Argon2 hashing) and the remind routes
+#      (broker publish) have their own bucket per user (per client IP before login) -> 429
+#   3. user budget: every authenticated request takes a token from the user's bucket -> 429
+# Token bucket: holds up to N tokens, refills at N per `seconds`, a request takes one.
+# So "100/10" allows bursts of 100 and 10 requests/second sustained.
+#
+# The user comes from the bearer token, verified with oauth2.verify_access_token_cached
+# (the route's own get_token_data then hits the same cache). A missing/invalid token is
+# not rejected here, the route does that: those requests only get the in-flight cap.
+# Client IPs: behind a proxy start uvicorn with --forwarded-allow-ips so scope["client"] is
+# the real client, otherwise every signup/login shares the proxy's bucket.
+#
+# Buckets live in this process (one set per API worker) or, with REDIS_URL, in Redis
+# (one Lua script per check, so all workers share them). Redis trouble = admit the request:
+# the limiter must not be what takes the API down.
+
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+from . import metrics
+from .cache import get_async_redis
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# never limited: load balancer/Docker health checks and the Prometheus scrape
+EXEMPT_PATHS = {"/health", "/health/pool", "/metrics"}
+# long-lived streams: a budget check when they open, but they don't hold an in-flight slot
+# (a few slow downloads would otherwise push every short request to 503). Path -> the
+# setting capping how many of them run at once in this process, None = no cap.
+STREAM_PATHS = {"/tasks/events": None, "/tasks/export": "admission_max_exports"}
+IN_FLIGHT = "in_flight"  # the slot every other request holds
+
+# (budget name, method, path) -> setting with its "<requests>/<seconds>"
+ROUTE_BUDGETS = [
+    ("login", "POST", re.compile(r"^/login/?$"), "rate_limit_login"),
+    ("signup", "POST", re.compile(r"^/users/?$"), "rate_limit_signup"),
+    ("remind", "POST", re.compile(r"^/tasks/(\d+/)?remind/?$"), "rate_limit_remind"),
+]
+
+
+def parse_budget(value: Optional[str]) -> Optional[Tuple[float, float]]:
+    """"100/10" -> (capacity 100, refill 10.0 tokens/s). Empty or "0" = no limit."""
+    if not value or value.strip() in ("0", "off"):
+        return None
+    requests, _, seconds = value.partition("/")
+    capacity, seconds = float(requests), float(seconds or 1)
+    if capacity <= 0 or seconds <= 0:
+        raise ValueError(f"Bad rate limit {value!r}, expected '<requests>/<seconds>'")
+    return capacity, capacity / seconds
+
+
+# ---------------------------------
+# TOKEN BUCKETS
+# ---------------------------------
+
+class LocalBuckets:
+    """Buckets in this process, LRU over keys (an evicted key just starts full again)."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, monotonic time of last update)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        """Take one token. Returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    async def atake(self, key: str, capacity: float, rate: float) -> float:
+        return self.take(key, capacity, rate)
+
+
+# Same algorithm as LocalBuckets.take, run atomically inside Redis with Redis' own clock
+# (API hosts' clocks may disagree). The key expires once the bucket would be full again.
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    def __init__(self, prefix: str = "ratelimit"):
+        self.prefix = prefix
+        self._script = None
+
+    async def atake(self, key: str, capacity: float, rate: float) -> float:
+        if self._script is None:
+            self._script = get_async_redis().register_script(_TAKE_SCRIPT)
+        wait = await self._script(keys=[f"{self.prefix}:{key}"], args=[capacity, rate])
+        return float(wait)
+
+
+def make_buckets():
+    if settings.redis_url:
+        return RedisBuckets()
+    return LocalBuckets(max_keys=settings.rate_limit_max_keys)
+
+
+# ---------------------------------
+# ASGI MIDDLEWARE
+# ---------------------------------
+
+class AdmissionMiddleware:
+    """Pure ASGI like metrics.TimingMiddleware: rejected requests never reach routing."""
+
+    def __init__(self, app, buckets=None):
+        self.app = app
+        self.buckets = buckets or make_buckets()
+        # requests running per slot (IN_FLIGHT or a stream path) and each slot's cap, 0 = none.
+        # Only touched on the event loop, no lock needed.
+        self.caps = {IN_FLIGHT: settings.admission_max_in_flight,
+                     **{path: getattr(settings, setting) if setting else 0
+                        for path, setting in STREAM_PATHS.items()}}
+        self.running = dict.fromkeys(self.caps, 0)
+        self.user_budget = parse_budget(settings.rate_limit_user)
+        self.route_budgets = [(name, method, pattern, parse_budget(getattr(settings, setting)))
+                              for name, method, pattern, setting in ROUTE_BUDGETS]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        # streams count against their own cap (if any), everything else against the in-flight one
+        slot = scope["path"] if scope["path"] in STREAM_PATHS else IN_FLIGHT
+        if 0 < self.caps[slot] <= self.running[slot]:
+            await _reject(send, 503, 1, "in_flight" if slot == IN_FLIGHT else "streams",
+                          "Server is busy, please retry shortly")
+            return
+
+        self.running[slot] += 1
+        try:
+            rejected = await self._check_budgets(scope)
+            if rejected is not None:
+                budget, wait = rejected
+                await _reject(send, 429, wait, budget, "Too many requests, please slow down")
+                return
+            await self.app(scope, receive, send)
+        finally:
+            self.running[slot] -= 1
+
+    async def _check_budgets(self, scope) -> Optional[Tuple[str, float]]:
+        """(budget name, seconds to wait) for the first exhausted budget, or None."""
+        user_id = await _user_id(scope)
+        who = f"user:{user_id}" if user_id is not None else f"ip:{_client_ip(scope)}"
+        checks = [(name, f"{name}:{who}", budget) for name, method, pattern, budget in self.route_budgets
+                  if budget and scope["method"] == method and pattern.match(scope["path"])]
+        if self.user_budget and user_id is not None:
+            checks.append(("user", f"user:{user_id}", self.user_budget))
+
+        for name, key, (capacity, rate) in checks:
+            try:
+                wait = await self.buckets.atake(key, capacity, rate)
+            except Exception:
+                logger.warning(f"Rate limiter unavailable, admitting request ({name})", exc_info=True)
+                return None
+            if wait > 0:
+                return name, wait
+        return None
+
+
+async def _user_id(scope) -> Optional[int]:
+    from .oauth2 import verify_access_token_cached
+    authorization = _header(scope, b"authorization")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return (await verify_access_token_cached(token, HTTPException(status_code=401)))["id"]
+    except HTTPException:
+        return None  # invalid/expired: the route answers 401
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _client_ip(scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def _reject(send, status_code: int, wait: float, reason: str, detail: str):
+    metrics.ADMISSION_REJECTED.labels(reason).inc()
+    retry_after = str(max(1, math.ceil(wait)))
+    body = f'{{"detail": "{detail}"}}'.encode()
+    await send({"type": "http.response.start", "status": status_code,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode()),
+                            (b"retry-after", retry_after.encode())]})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,159 @@
+# --------------------------------
+# purpose: one-off database setup, run before the API and the workers start.
+# target: Cloud Task Manager API
+# --------------------------------
+
+# app/bootstrap.py
+
+"""
+Create the schema (tables, indexes, search index), bring an existing one up to date, exit.
+
+Usage:
+    python -m app.bootstrap             # wait up to 30s for the database, then create
+    python -m app.bootstrap --wait 0    # fail right away if the database is down
+
+Safe to run on every deploy: create_all creates missing tables, then the upgrade steps
+add columns/indexes that were added to tables which already existed (create_all skips
+those). Every step checks first, so a second run changes nothing. docker-compose runs
+it as the `bootstrap` service.
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+from sqlalchemy import exc, inspect, text
+
+from . import models
+from .database import engine  # one-shot process, the engine is never rebuilt here
+
+logger = logging.getLogger("app.bootstrap")
+
+
+def wait_for_database(timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return
+        except exc.OperationalError as error:
+            if time.monotonic() >= deadline:
+                raise
+            logger.info(f"Database not ready yet ({error.orig}), retrying...")
+            time.sleep(1)
+
+
+def create_schema():
+    # DOCS_MENTIONED: "SQLAlchemy will look at all the classes that inherit from Base (in models.py)
+    # and generate the corresponding SQL "CREATE TABLE" statements."
+    models.Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+
+
+# ---------------------------------
+# UPGRADING AN EXISTING SCHEMA
+# ---------------------------------
+
+# DEVNOTE: create_all only creates missing TABLES. A column or index added later to a
+# table that already exists is skipped, and on a database from an older version every
+# select(Task) then fails on the missing column. So every such change to models.py also
+# gets a step in UPGRADE_STEPS: it looks at the live schema and adds only what is missing.
+# Steps are additive only (no renames, type changes or drops) and stay in the list once
+# released, an old database may still need them. If we ever need more than that, this is
+# the point to switch to Alembic.
+
+def _add_missing_column(conn, column) -> bool:
+    """ALTER TABLE ADD COLUMN, nullable and without a DB default (those need a backfill)."""
+    table = column.table.name
+    if column.name in {col["name"] for col in inspect(conn).get_columns(table)}:
+        return False
+    ddl_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column.name} {ddl_type}"))
+    return True
+
+
+def _create_missing_index(conn, index) -> bool:
+    if index.name in {ix["name"] for ix in inspect(conn).get_indexes(index.table.name)}:
+        return False
+    index.create(conn)
+    return True
+
+
+def _task_index(name):
+    return next(index for index in models.Task.__table__.indexes if index.name == name)
+
+
+def _keyset_index(conn) -> bool:
+    # GET /tasks/ keyset pagination seeks on (owner_id, id)
+    return _create_missing_index(conn, _task_index("ix_tasks_owner_id_id"))
+
+
+def _due_date(conn) -> bool:
+    # overdue scanner: the column, then the partial index on it (incomplete tasks only)
+    added = _add_missing_column(conn, models.Task.__table__.c.due_date)
+    return _create_missing_index(conn, _task_index("ix_tasks_due_date_incomplete")) or added
+
+
+def _updated_at(conn) -> bool:
+    # overdue scanner watermark for tasks saved with a past deadline; old rows stay NULL
+    added = _add_missing_column(conn, models.Task.__table__.c.updated_at)
+    return _create_missing_index(conn, _task_index("ix_tasks_updated_at_incomplete")) or added
+
+
+def _search_index(conn) -> bool:
+    # a tasks table from before the search index existed: after_create didn't run for it
+    ensure_search_index(conn)
+    return False  # idempotent DDL, nothing to report
+
+
+# (name, step). A step returns True when it changed something.
+UPGRADE_STEPS = [
+    ("index tasks(owner_id, id)", _keyset_index),
+    ("tasks.due_date + partial index", _due_date),
+    ("tasks.updated_at + partial index", _updated_at),
+    ("search index", _search_index),
+]
+
+
+def upgrade_schema():
+    with engine.begin() as conn:
+        for name, step in UPGRADE_STEPS:
+            if step(conn):
+                logger.info(f"Schema upgrade: {name}")
+
+
+def ensure_search_index(conn):
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        for statement in models.POSTGRES_SEARCH_DDL:
+            conn.execute(text(statement))
+    elif dialect == "sqlite":
+        missing = not inspect(conn).has_table("tasks_fts")
+        for statement in models.SQLITE_SEARCH_DDL:
+            conn.execute(text(statement))
+        if missing:
+            # index the rows that were there before the FTS table
+            conn.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wait", type=float, default=30.0, help="seconds to wait for the database")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    start = time.perf_counter()
+    try:
+        wait_for_database(args.wait)
+        create_schema()
+    except exc.SQLAlchemyError as error:
+        logger.error(f"Bootstrap failed: {error}")
+        return 1
+    logger.info(f"Schema ready in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
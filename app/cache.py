@@ -0,0 +1,171 @@
+# --------------------------------
+# purpose: small TTL caches, in-process or shared through Redis.
+# target: Cloud Task Manager API
+# --------------------------------
+
+# app/cache.py
+
+# DEVNOTE: both caches have the same methods, so callers don't care which one they got.
+# sync get/set/delete for sync code (ORM events, Celery), aget/aset/adelete for async routes.
+# add/aadd is set-if-absent (Redis SET NX): the first caller wins, everyone else gets
+# the value it stored. That's what the reminder dedupe uses to publish only once.
+# With REDIS_URL unset everything stays in this process (fine for one worker and for tests).
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from .config import settings
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU dict where every entry also has its own expiry time."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key: str, value: Any, ttl: float) -> Any:
+        """Store only if absent (or expired). Returns None if stored, else the current value."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > time.monotonic():
+                return entry[1]
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return None
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        return self.get(key, default)
+
+    async def aset(self, key: str, value: Any, ttl: float) -> None:
+        self.set(key, value, ttl)
+
+    async def aadd(self, key: str, value: Any, ttl: float) -> Any:
+        return self.add(key, value, ttl)
+
+    async def adelete(self, key: str) -> None:
+        self.delete(key)
+
+
+class RedisCache:
+    """Same interface as TTLCache, values stored as JSON with a PX expiry so Redis drops them."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raw = get_redis().get(self._key(key))
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl > 0:
+            get_redis().set(self._key(key), json.dumps(value), px=int(ttl * 1000))
+
+    def add(self, key: str, value: Any, ttl: float) -> Any:
+        client = get_redis()
+        while True:
+            if client.set(self._key(key), json.dumps(value), px=int(ttl * 1000), nx=True):
+                return None
+            raw = client.get(self._key(key))
+            if raw is not None:
+                return json.loads(raw)
+            # expired between SET NX and GET, try to claim it again
+
+    def delete(self, key: str) -> None:
+        get_redis().delete(self._key(key))
+
+    def clear(self) -> None:
+        client = get_redis()
+        for key in client.scan_iter(match=f"{self.prefix}:*"):
+            client.delete(key)
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        raw = await get_async_redis().get(self._key(key))
+        return default if raw is None else json.loads(raw)
+
+    async def aset(self, key: str, value: Any, ttl: float) -> None:
+        if ttl > 0:
+            await get_async_redis().set(self._key(key), json.dumps(value), px=int(ttl * 1000))
+
+    async def aadd(self, key: str, value: Any, ttl: float) -> Any:
+        client = get_async_redis()
+        while True:
+            if await client.set(self._key(key), json.dumps(value), px=int(ttl * 1000), nx=True):
+                return None
+            raw = await client.get(self._key(key))
+            if raw is not None:
+                return json.loads(raw)
+
+    async def adelete(self, key: str) -> None:
+        await get_async_redis().delete(self._key(key))
+
+
+# ---------------------------------
+# SHARED REDIS CLIENTS (created lazily, only if REDIS_URL is set)
+# ---------------------------------
+
+_redis = None
+_async_redis = None
+
+
+def get_redis():
+    global _redis
+    if _redis is None and settings.redis_url:
+        import redis
+        _redis = redis.Redis.from_url(settings.redis_url)
+    return _redis
+
+
+def get_async_redis():
+    global _async_redis
+    if _async_redis is None and settings.redis_url:
+        import redis.asyncio
+        _async_redis = redis.asyncio.Redis.from_url(settings.redis_url)
+    return _async_redis
+
+
+def make_cache(prefix: str, max_entries: int = 10000):
+    """Redis-backed cache when REDIS_URL is configured, otherwise an in-process TTLCache."""
+    if settings.redis_url:
+        return RedisCache(prefix)
+    return TTLCache(max_entries=max_entries)
@@ -1,22 +1,128 @@
 # app/config.py
 
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
 
     # Database settings
-    database_hostname: str
-    database_port: str
-    database_password: str
-    database_name: str
-    database_username: str
+    database_hostname: Optional[str] = None
+    database_port: Optional[str] = None
+    database_password: Optional[str] = None
+    database_name: Optional[str] = None
+    database_username: Optional[str] = None
+
+    # DEVNOTE: a full SQLAlchemy URL wins over the fields above when it is set,
+    # e.g. DATABASE_URL=sqlite:///./dev.db for running without Postgres.
+    database_url: Optional[str] = None
+
+    # "sync": blocking Session on Starlette's threadpool (the original behaviour).
+    # "async": AsyncEngine/AsyncSession on asyncpg (or aiosqlite for sqlite URLs).
+    database_mode: str = "sync"
+
+    # Optional read replicas, comma-separated SQLAlchemy URLs (same format as database_url).
+    # Read-only routes and the current-user lookup go to them round-robin; writes always
+    # go to the primary. A user who just wrote reads from the primary for
+    # replica_sticky_seconds, so keep it above the replicas' usual lag.
+    database_replica_urls: Optional[str] = None
+    replica_sticky_seconds: int = 5
+
+    # Connection pool (per engine, per process). Size it so that
+    # api_workers * (pool_size + max_overflow) stays under Postgres max_connections.
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0   # seconds to wait for a free connection before erroring
+    db_pool_recycle: int = 1800     # seconds; -1 keeps connections forever
+    db_pool_pre_ping: bool = True   # cheap liveness check on checkout, drops dead connections
+
+    # python -m app.serve: API worker processes (0 = one per CPU) and the DB connections
+    # all of them together may open. Each worker gets budget // workers, split between
+    # pool_size and max_overflow in the db_pool_size : db_max_overflow ratio.
+    serve_workers: int = 0
+    serve_db_connection_budget: int = 60
+    # seconds a stopping worker gets to finish its in-flight requests
+    serve_graceful_timeout: int = 30
 
     # JWT settings
     secret_key: str
     algorithm: str
     access_token_expire_minutes: int
 
+    # Argon2 cost parameters. A stored hash whose time cost, memory cost or parallelism
+    # differs from these (raised or lowered) is re-hashed on the next successful login.
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536   # KiB
+    argon2_parallelism: int = 4
+
+    # Dedicated process pool for hashing/verifying passwords, off the API's GIL.
+    # 0 workers = run on the shared threadpool instead (the old behaviour).
+    password_hash_workers: int = 2
+    # jobs allowed to wait for a hash worker before we answer 503
+    password_hash_queue_size: int = 32
+
+    # Max items accepted by one bulk create/update/delete request.
+    bulk_max_items: int = 500
+
+    # Task ids per Celery message for POST /tasks/remind (and max ids per request).
+    reminder_batch_size: int = 100
+    reminder_max_tasks: int = 5000
+
+    # POST /tasks/{id}/remind: repeats for the same task within this window reuse the
+    # queued job instead of publishing again. Idempotency-Key headers are kept longer.
+    reminder_debounce_seconds: int = 60
+    idempotency_key_ttl: int = 24 * 3600
+    reminder_claims_max_entries: int = 10000
+
+    # Job status records (GET /jobs/{id}) are kept this long, in Redis or in-process.
+    job_status_ttl: int = 24 * 3600
+    job_status_max_entries: int = 10000
+
+    # Rows fetched per server-side cursor round trip for GET /tasks/export.
+    export_batch_size: int = 1000
+
+    # GET /tasks/search only ever returns the best search_top_k matches (limit/offset page inside them).
+    search_top_k: int = 200
+    search_max_page_size: int = 100
+
+    # GET /tasks/events (SSE change feed): events kept per user for Last-Event-ID resume,
+    # how long an idle user's buffer lives in Redis, the keep-alive interval, and how many
+    # undelivered events a slow client may have before its stream is closed (it resumes).
+    events_replay_size: int = 500
+    events_replay_ttl: int = 24 * 3600
+    events_max_users: int = 10000   # in-process backend only
+    events_heartbeat_seconds: int = 15
+    events_client_queue_size: int = 1000
+
+    # Admission control (app/admission.py). Over admission_max_in_flight running requests
+    # in one API process -> 503 (0 = no cap). Rate limits are token buckets written
+    # "<requests>/<seconds>": bursts of <requests>, refilled at <requests> per <seconds>
+    # ("off" = no limit). Over one -> 429. Per process unless REDIS_URL is set.
+    # Keep the in-flight cap under the threadpool size (40): above it requests holding a DB
+    # connection can wait for a thread while every thread waits for a connection.
+    admission_max_in_flight: int = 32
+    # GET /tasks/export runs as long as the download and doesn't count as in flight; it has
+    # its own cap per process instead (0 = no cap), over it -> 503
+    admission_max_exports: int = 4
+    rate_limit_user: str = "100/10"     # every authenticated request, per user
+    rate_limit_login: str = "10/60"     # POST /login, per client IP
+    rate_limit_signup: str = "5/300"    # POST /users/, per client IP
+    rate_limit_remind: str = "30/60"    # POST /tasks/{id}/remind and /tasks/remind, per user
+    rate_limit_max_keys: int = 100000   # in-process buckets kept (LRU)
+
+    # Optional shared Redis (e.g. redis://redis:6379/0). Unset = in-process stores only.
+    redis_url: Optional[str] = None
+
+    # Cache of verified tokens and current-user rows used by oauth2.get_current_user.
+    # Token entries never outlive the token's own exp claim.
+    auth_cache_ttl: int = 300
+    auth_cache_max_entries: int = 10000
+
+    # Add a Server-Timing header (db/auth/hash/publish/app durations) to every response.
+    # Browsers show it in the network tab; turn off if timings shouldn't be public.
+    server_timing: bool = True
+
     class Config:
         env_file = ".env"
 
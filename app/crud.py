@@ -0,0 +1,242 @@
+# --------------------------------
+# purpose: data-access functions for tasks (the SQL lives here, HTTP lives in routers).
+# target: Cloud Task Manager API
+# --------------------------------
+
+# app/crud.py
+
+# DEVNOTE: every single-task operation puts "owner_id = :me" in the SQL itself, so
+# reading, updating or deleting an owned task is ONE statement (update/delete use
+# RETURNING to hand back the row). Only when nothing matched do routers pay for
+# task_exists() to tell 404 (no such task) from 403 (somebody else's task).
+#
+# Functions take the AsyncSession-style session from database.get_async_db and do not
+# commit; the caller decides where the transaction ends.
+#
+# Every write also moves the owner's task_stats counters by the exact delta (known from
+# RETURNING), inside the same transaction, so the counters commit or roll back with it.
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, column, delete, func, insert, literal_column, select, table, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import models
+
+Task = models.Task
+TaskStats = models.TaskStats
+
+
+# ---------------------------------
+# SINGLE TASK
+# ---------------------------------
+
+async def create_task(db, owner_id: int, values: dict) -> Task:
+    # INSERT ... RETURNING gives back id/created_at without a second SELECT (db.refresh)
+    task = await db.scalar(insert(Task).values(owner_id=owner_id, **values).returning(Task))
+    await add_to_stats(db, owner_id, total=1, completed=int(task.completed))
+    return task
+
+
+async def get_owned_task(db, task_id: int, owner_id: int) -> Optional[Task]:
+    return await db.scalar(select(Task).where(Task.id == task_id, Task.owner_id == owner_id))
+
+
+async def update_owned_task(db, task_id: int, owner_id: int, values: dict) -> Optional[Task]:
+    updated = await _update_owned(db, owner_id, [task_id], values)
+    return updated.get(task_id)
+
+
+async def delete_owned_task(db, task_id: int, owner_id: int) -> bool:
+    return bool(await delete_owned_tasks(db, owner_id, [task_id]))
+
+
+async def task_exists(db, task_id: int) -> bool:
+    # cheap probe (primary key index only), used after an owned-operation matched nothing
+    return await db.scalar(select(Task.id).where(Task.id == task_id)) is not None
+
+
+# ---------------------------------
+# LISTING
+# ---------------------------------
+
+async def list_tasks(db, owner_id: int, columns: List[str], limit: int, after_id: Optional[int] = None,
+                     completed: Optional[bool] = None, created_after: Optional[datetime] = None,
+                     created_before: Optional[datetime] = None) -> List[tuple]:
+    """
+    Keyset page on (owner_id, id). Returns up to `limit` rows, filters run in SQL.
+
+    Rows are plain tuples of `columns` (no ORM objects): the list route encodes them as-is.
+    """
+    query = select(*(getattr(Task, name) for name in columns)).where(Task.owner_id == owner_id)
+    if after_id is not None:
+        query = query.where(Task.id > after_id)
+    if completed is not None:
+        query = query.where(Task.completed == completed)
+    if created_after is not None:
+        query = query.where(Task.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(Task.created_at < created_before)
+    return (await db.execute(query.order_by(Task.id).limit(limit))).all()
+
+
+def export_statement(owner_id: int, columns: List[str], after_id: Optional[int] = None):
+    """Plain column rows (no ORM objects) for streaming, ordered by id so exports can resume."""
+    query = select(*(getattr(Task, name) for name in columns)).where(Task.owner_id == owner_id)
+    if after_id is not None:
+        query = query.where(Task.id > after_id)
+    return query.order_by(Task.id)
+
+
+# ---------------------------------
+# SEARCH
+# ---------------------------------
+
+# DEVNOTE: the search structures are created by DDL in models.py, they're not ORM columns.
+_search_vector = literal_column("tasks.search_vector")
+_fts = table("tasks_fts", column("rowid"))
+
+
+def _fts5_query(text: str) -> str:
+    # every word as a quoted string: AND of the words, and no FTS5 syntax errors from user input
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+async def search_tasks(db, owner_id: int, text: str, limit: int, offset: int = 0) -> List[tuple]:
+    """
+    (task, rank) for the owner's tasks matching `text`, best first (higher rank = better).
+
+    Postgres ranks with ts_rank_cd on the weighted tsvector (title above content),
+    sqlite with FTS5 bm25 (negated, because bm25 is lower = better).
+    """
+    if db.bind.dialect.name == "postgresql":
+        tsquery = func.websearch_to_tsquery(models.SEARCH_CONFIG, text)
+        rank = func.ts_rank_cd(_search_vector, tsquery)
+        query = select(Task, rank).where(Task.owner_id == owner_id, _search_vector.op("@@")(tsquery))
+    else:
+        rank = -func.bm25(literal_column("tasks_fts"), 2.0, 1.0)  # title weighs double
+        query = (select(Task, rank)
+                 .join(_fts, _fts.c.rowid == Task.id)
+                 .where(Task.owner_id == owner_id, literal_column("tasks_fts").op("MATCH")(_fts5_query(text))))
+
+    # id as the tie-breaker keeps offset pages stable
+    rows = await db.execute(query.order_by(rank.desc(), Task.id).limit(limit).offset(offset))
+    return rows.all()
+
+
+# ---------------------------------
+# BULK
+# ---------------------------------
+
+async def task_owners(db, task_ids: Iterable[int]) -> Dict[int, int]:
+    """{task_id: owner_id} for the ids that exist, in one query."""
+    rows = await db.execute(select(Task.id, Task.owner_id).where(Task.id.in_(set(task_ids))))
+    return {task_id: owner_id for task_id, owner_id in rows}
+
+
+async def create_tasks(db, owner_id: int, values: List[dict]) -> List[Task]:
+    # DEVNOTE: one multi-row INSERT ... RETURNING (SQLAlchemy "insertmanyvalues", up to
+    # 1000 rows per statement, more than bulk_max_items). RETURNING rows have no guaranteed
+    # order. sort_by_parameter_order=True would fix that, but on sqlite it falls back to one
+    # INSERT per row (11 statements for 10 tasks). Ids are handed out in VALUES order within
+    # one INSERT (serial on Postgres, rowid on sqlite), so sorting by id gives the input order.
+    rows = await db.scalars(insert(Task).returning(Task),
+                            [{"owner_id": owner_id, **item} for item in values])
+    created = sorted(rows.all(), key=lambda task: task.id)
+    await add_to_stats(db, owner_id, total=len(created), completed=sum(task.completed for task in created))
+    return created
+
+
+async def update_owned_tasks(db, owner_id: int, changes: Dict[int, dict]) -> Dict[int, Task]:
+    """
+    Apply {task_id: {field: value}} in ONE UPDATE.
+
+    Each column becomes a CASE on id; ids that don't touch a column keep its current value.
+    """
+    values = {}
+    for field in ("title", "content", "completed", "due_date"):
+        whens = {task_id: fields[field] for task_id, fields in changes.items() if field in fields}
+        if whens:
+            values[field] = case(whens, value=Task.id, else_=getattr(Task, field))
+
+    return await _update_owned(db, owner_id, list(changes), values)
+
+
+async def _update_owned(db, owner_id: int, task_ids: List[int], values: dict) -> Dict[int, Task]:
+    query = update(Task).values(**values).execution_options(synchronize_session=False)
+
+    if "completed" not in values:
+        # counters can't change, plain UPDATE ... RETURNING
+        rows = await db.scalars(
+            query.where(Task.id.in_(task_ids), Task.owner_id == owner_id).returning(Task))
+        return {task.id: task for task in rows.all()}
+
+    # DEVNOTE: RETURNING only sees the new row. On Postgres the old `completed` comes
+    # from a locked subquery joined in (UPDATE ... FROM): one statement, exact delta.
+    # The rows are locked in id order: two bulk updates of overlapping ids that lock in
+    # plan order can each hold a row the other waits for (deadlock, one request fails).
+    # sqlite can't RETURN columns of a joined table, so it reads them first; a write
+    # from another connection in between would skew the counters until the next
+    # reconcile_task_stats run, acceptable for the local/dev database.
+    if db.bind.dialect.name == "postgresql":
+        old = (select(Task.id, Task.completed)
+               .where(Task.id.in_(task_ids), Task.owner_id == owner_id)
+               .order_by(Task.id)
+               .with_for_update()
+               .subquery("old"))
+        rows = (await db.execute(query.where(Task.id == old.c.id).returning(Task, old.c.completed))).all()
+    else:
+        owned = (Task.id.in_(task_ids), Task.owner_id == owner_id)
+        was = dict((await db.execute(select(Task.id, Task.completed).where(*owned))).all())
+        updated = (await db.scalars(query.where(*owned).returning(Task))).all()
+        rows = [(task, was[task.id]) for task in updated]
+    await add_to_stats(db, owner_id, completed=sum(int(task.completed) - int(was) for task, was in rows))
+    return {task.id: task for task, _ in rows}
+
+
+async def delete_owned_tasks(db, owner_id: int, task_ids: Iterable[int]) -> set:
+    # owner_id is in the WHERE too, so the statement can't delete someone else's task
+    rows = (await db.execute(
+        delete(Task)
+        .where(Task.id.in_(set(task_ids)), Task.owner_id == owner_id)
+        .returning(Task.id, Task.completed)
+        .execution_options(synchronize_session=False))).all()
+    await add_to_stats(db, owner_id, total=-len(rows), completed=-sum(completed for _, completed in rows))
+    return {task_id for task_id, _ in rows}
+
+
+# ---------------------------------
+# STATS COUNTERS
+# ---------------------------------
+
+def stats_upsert(dialect_name: str, rows: List[dict], increment: bool = True):
+    """
+    INSERT ... ON CONFLICT (user_id) DO UPDATE for task_stats rows {user_id, total, completed}.
+
+    increment=True adds the values to the stored counters (writes), False overwrites
+    them (reconciliation). Used by the sync Celery tasks too, hence no session here.
+    """
+    statement = (postgresql_insert if dialect_name == "postgresql" else sqlite_insert)(TaskStats).values(rows)
+    excluded = statement.excluded
+    if increment:
+        counters = {"total": TaskStats.total + excluded.total,
+                    "completed": TaskStats.completed + excluded.completed}
+    else:
+        counters = {"total": excluded.total, "completed": excluded.completed}
+    return statement.on_conflict_do_update(index_elements=[TaskStats.user_id],
+                                           set_={**counters, "updated_at": func.now()})
+
+
+async def add_to_stats(db, owner_id: int, total: int = 0, completed: int = 0):
+    if total or completed:
+        await db.execute(stats_upsert(db.bind.dialect.name,
+                                      [{"user_id": owner_id, "total": total, "completed": completed}]))
+
+
+async def get_stats(db, owner_id: int) -> dict:
+    # one primary-key lookup, however many tasks the user has
+    stats = await db.get(TaskStats, owner_id)
+    total, completed = (stats.total, stats.completed) if stats else (0, 0)
+    return {"total": total, "completed": completed, "incomplete": total - completed}
@@ -1,18 +1,102 @@
 # filepath: app/database.py
 
-from sqlalchemy import create_engine
+import itertools
+import threading
+import time
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+from .cache import make_cache
 from .config import settings
 
 
 # This is the connection URL for SQLAlchemy afaik!!
 # "Format" should be: 'postgresql://<user>:<password>@<hostname>:<port>/<dbname>'
+# DEVNOTE: settings.database_url overrides it (handy for sqlite:///./dev.db).
+
+DATABASE_URL = settings.database_url or f"postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}"
+
+
+# ---------------------------------
+# CONNECTION POOL
+# ---------------------------------
+
+class PoolStats:
+    """Counters for connection checkouts: how many, how long we waited, how many timed out."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+
+
+class _InstrumentedPoolMixin:
+    # DEVNOTE: _do_get is where QueuePool blocks waiting for a free connection
+    # (or raises TimeoutError after pool_timeout), so timing it gives us the queueing.
+    stats: PoolStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return conn
+
 
-DATABASE_URL = f"postgresql://{settings.database_username}:{settings.database_password}@{settings.database_hostname}:{settings.database_port}/{settings.database_name}"
+def instrumented_pool(base, stats: PoolStats):
+    # a class per engine, because SQLAlchemy rebuilds the pool from its class on dispose()
+    return type(f"Instrumented{base.__name__}", (_InstrumentedPoolMixin, base), {"stats": stats})
+
+
+def engine_options(url: str, pool_class, stats: PoolStats,
+                   pool_size: int = None, max_overflow: int = None) -> dict:
+    url = make_url(url)
+    # in-memory sqlite has a single shared connection, there is no pool to tune
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": instrumented_pool(pool_class, stats),
+        "pool_size": settings.db_pool_size if pool_size is None else pool_size,
+        "max_overflow": settings.db_max_overflow if max_overflow is None else max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+pool_stats = PoolStats()
 
 # The 'engine' is the core interface to the database.
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, QueuePool, pool_stats))
 
 # session is a temporary connection to the database for performing transactions!
 # a configurable session class.
@@ -22,6 +106,33 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+# Rebuild the engines with a different pool size (Celery workers, app.serve workers).
+# DEVNOTE: after fork() the inherited pool's sockets belong to the parent too, so with
+# inherited=True we only forget them (close=False) and let the parent keep using them.
+# SessionLocal is re-bound in place, so modules that imported it pick up the new engine.
+def configure_engine(pool_size: int = None, max_overflow: int = None, inherited: bool = False):
+    global engine, async_engine
+    engine.dispose(close=not inherited)
+    engine = create_engine(DATABASE_URL, **engine_options(
+        DATABASE_URL, QueuePool, pool_stats, pool_size=pool_size, max_overflow=max_overflow))
+    SessionLocal.configure(bind=engine)
+
+    if ASYNC_MODE:
+        # only called before an event loop runs, closing async connections needs one: just drop them
+        async_engine.sync_engine.dispose(close=False)
+        async_engine = create_async_engine(to_async_url(DATABASE_URL), **engine_options(
+            DATABASE_URL, AsyncAdaptedQueuePool, async_pool_stats, pool_size=pool_size, max_overflow=max_overflow))
+        AsyncSessionLocal.configure(bind=async_engine)
+
+    # replicas get the same per-process size (their max_connections is their own budget)
+    for replica in replica_engines:
+        replica.dispose(close=not inherited)
+    for replica in async_replica_engines:
+        replica.sync_engine.dispose(close=False)
+    _build_replica_engines(pool_size, max_overflow)
+    return engine
+
+
 # Dependency function to get a database session
 def get_db():
     db = SessionLocal()
@@ -29,3 +140,240 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ---------------------------------
+# ASYNC MODE
+# ---------------------------------
+
+# Same database, async driver. asyncpg for Postgres, aiosqlite for local sqlite files.
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+ASYNC_MODE = settings.database_mode == "async"
+
+async_pool_stats = PoolStats()
+
+# DEVNOTE: only build the async engine when asked, so sync deployments don't need asyncpg.
+async_engine = create_async_engine(
+    to_async_url(DATABASE_URL),
+    **engine_options(DATABASE_URL, AsyncAdaptedQueuePool, async_pool_stats)) if ASYNC_MODE else None
+
+# expire_on_commit=False: AsyncSession can't lazy-load after commit, so we keep the values.
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False) if ASYNC_MODE else None
+
+
+class ThreadedSession:
+    """
+    The awaitable subset of AsyncSession on top of a blocking Session.
+
+    Each call runs on Starlette's threadpool, so routers can be written once
+    against the AsyncSession API and still work when database_mode is "sync".
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    @property
+    def bind(self):
+        return self.sync_session.get_bind()
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def refresh(self, instance, *args, **kwargs):
+        await run_in_threadpool(self.sync_session.refresh, instance, *args, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self, *args, **kwargs):
+        await run_in_threadpool(self.sync_session.flush, *args, **kwargs)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+
+# Dependency for async def endpoints: a real AsyncSession in async mode,
+# otherwise a ThreadedSession around the usual SessionLocal.
+async def get_async_db():
+    if ASYNC_MODE:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    db = ThreadedSession(SessionLocal(expire_on_commit=False))
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+# ---------------------------------
+# READ REPLICAS
+# ---------------------------------
+
+# DEVNOTE: read-only routes take their session from oauth2.get_read_db, which lands here.
+# Replicas lag the primary a little, so after a write the user is "pinned" to the primary
+# for replica_sticky_seconds (read-your-writes). The pin is set BEFORE the ETag version
+# bump (routers/task.py), otherwise a replica could serve old rows under the new ETag.
+# The pins live in Redis when REDIS_URL is set, so every API worker sees them.
+# Without replicas configured all of this is a no-op and reads use the primary.
+
+REPLICA_URLS = [url.strip() for url in (settings.database_replica_urls or "").split(",") if url.strip()]
+
+replica_pool_stats = [PoolStats() for _ in REPLICA_URLS]
+replica_engines = []
+async_replica_engines = []
+
+
+def _build_replica_engines(pool_size: int = None, max_overflow: int = None):
+    replica_engines[:] = [
+        create_engine(url, **engine_options(url, QueuePool, stats, pool_size=pool_size, max_overflow=max_overflow))
+        for url, stats in zip(REPLICA_URLS, replica_pool_stats)]
+    if ASYNC_MODE:
+        async_replica_engines[:] = [
+            create_async_engine(to_async_url(url), **engine_options(
+                url, AsyncAdaptedQueuePool, stats, pool_size=pool_size, max_overflow=max_overflow))
+            for url, stats in zip(REPLICA_URLS, replica_pool_stats)]
+
+
+_build_replica_engines()
+_next_replica = itertools.count()
+
+primary_pins = make_cache("primary-pin", max_entries=100000)
+
+
+async def pin_to_primary(user_id: int):
+    """Send this user's reads to the primary for the next replica_sticky_seconds."""
+    if REPLICA_URLS:
+        await primary_pins.aset(str(user_id), 1, settings.replica_sticky_seconds)
+
+
+async def is_pinned(user_id: int) -> bool:
+    return bool(REPLICA_URLS) and await primary_pins.aget(str(user_id)) is not None
+
+
+def _replica_index() -> int:
+    return next(_next_replica) % len(REPLICA_URLS)
+
+
+async def get_read_session(primary: bool = False):
+    """Like get_async_db, on a replica unless `primary` (or no replicas are configured)."""
+    if primary or not REPLICA_URLS:
+        async for db in get_async_db():
+            yield db
+        return
+
+    index = _replica_index()
+    if ASYNC_MODE:
+        async with AsyncSessionLocal(bind=async_replica_engines[index]) as db:
+            yield db
+        return
+
+    db = ThreadedSession(SessionLocal(bind=replica_engines[index], expire_on_commit=False))
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+# ---------------------------------
+# STREAMING READS
+# ---------------------------------
+
+# DEVNOTE: for exports. yield_per makes SQLAlchemy use a server-side cursor
+# (stream_results) and fetch `batch_size` rows at a time, so memory stays flat
+# however many rows match. It opens its own session because the stream outlives
+# the request handler (StreamingResponse keeps iterating after we return).
+async def stream_batches(statement, batch_size: int = 1000, replica: bool = False):
+    statement = statement.execution_options(yield_per=batch_size)
+    # replica=True: read from a replica when there are any (the caller checked the pin)
+    index = _replica_index() if replica and REPLICA_URLS else None
+
+    if ASYNC_MODE:
+        bind = async_engine if index is None else async_replica_engines[index]
+        async with AsyncSessionLocal(bind=bind) as db:
+            result = await db.stream(statement)
+            async for batch in result.partitions():
+                yield batch
+        return
+
+    def _batches():
+        with SessionLocal(bind=engine if index is None else replica_engines[index]) as db:
+            yield from db.execute(statement).partitions()
+
+    batches = _batches()
+    try:
+        while True:
+            # one threadpool hop per batch, not per row
+            batch = await run_in_threadpool(next, batches, None)
+            if batch is None:
+                break
+            yield batch
+    finally:
+        # client went away mid-stream: close the cursor and give the connection back
+        await run_in_threadpool(batches.close)
+
+
+# ---------------------------------
+# POOL STATUS (in-process API, also served by GET /health/pool)
+# ---------------------------------
+
+def _describe_pool(pool, stats: PoolStats) -> dict:
+    status = {"class": type(pool).__name__, **stats.snapshot()}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # overflow() goes negative while the pool is still filling up
+            "overflow_in_use": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    return status
+
+
+def pool_status() -> dict:
+    status = {"sync": _describe_pool(engine.pool, pool_stats)}
+    if async_engine is not None:
+        status["async"] = _describe_pool(async_engine.pool, async_pool_stats)
+    if REPLICA_URLS:
+        engines = async_replica_engines if ASYNC_MODE else replica_engines
+        status["replicas"] = [_describe_pool(replica.pool, stats)
+                              for replica, stats in zip(engines, replica_pool_stats)]
+    return status
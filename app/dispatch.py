@@ -0,0 +1,67 @@
+# --------------------------------
+# purpose: publish Celery jobs from the API, importing Celery on first use.
+# target: Cloud Task Manager API
+# --------------------------------
+
+# app/dispatch.py
+
+# DEVNOTE: the API only needs Celery when it actually queues something. Importing
+# celery + app.celery_app + app.tasks at startup cost every replica start (and every
+# test run) for nothing, so routers go through here and the first dispatch pays it once.
+# Both functions block on the broker: call them with run_in_threadpool.
+#
+# DEVNOTE: look tasks up on OUR app, not through the @shared_task proxies in app.tasks.
+# A proxy resolves Celery's "current app", which is per thread: in a threadpool thread
+# it is Celery's default app (no task_routes, no eager mode, broker only from the env).
+#
+# DEVNOTE: every task already has a queue + priority in celery_app.TASK_ROUTES. Callers
+# only pass queue=/priority= to say it explicitly or to override it for one message;
+# the names live here so routers can use them without importing Celery.
+
+import threading
+
+# queues (see app/celery_app.py): work a user is waiting for, scheduled/bulk work,
+# and syncs with other systems. Each one has its own workers.
+INTERACTIVE = "interactive"
+BATCH = "batch"
+SYNC = "sync"
+
+_app = None
+_lock = threading.Lock()
+
+
+def _celery():
+    global _app
+    if _app is None:
+        with _lock:
+            if _app is None:
+                from .celery_app import celery_app  # configured app + job/metrics signals
+                from . import tasks  # noqa: F401  registers the tasks on it
+                _app = celery_app
+    return _app
+
+
+def get_task(name: str):
+    return _celery().tasks[f"app.tasks.{name}"]
+
+
+def _route(queue: str = None, priority: int = None) -> dict:
+    """apply_async options; unset ones are left to the task's route."""
+    options = {}
+    if queue is not None:
+        options["queue"] = queue
+    if priority is not None:
+        options["priority"] = priority
+    return options
+
+
+def send(name: str, kwargs: dict, task_id: str = None, queue: str = None, priority: int = None):
+    """Publish one job. task_id lets the caller pick the job id before publishing."""
+    return get_task(name).apply_async(kwargs=kwargs, task_id=task_id, **_route(queue, priority))
+
+
+def send_group(name: str, kwargs_list: list, queue: str = None, priority: int = None):
+    """One message per kwargs dict, published together as a Celery group."""
+    from celery import group
+    task = get_task(name)
+    return group(task.s(**kwargs) for kwargs in kwargs_list).apply_async(**_route(queue, priority))
@@ -0,0 +1,306 @@
+# --------------------------------
+# purpose: per-user change feed behind GET /tasks/events (Server-Sent Events).
+# target: Cloud Task Manager API
+# --------------------------------
+
+# app/events.py
+
+# DEVNOTE: clients used to poll GET /tasks/ to notice changes. Now the task routes and
+# the Celery tasks publish small events here and GET /tasks/events streams them.
+#
+#   publish(user_id, [("task.created", {...}), ...])
+#     -> every event gets an id ("<ms>-<seq>", always increasing, the Redis stream format)
+#     -> it goes into the user's replay buffer (last events_replay_size events)
+#     -> it is handed to the user's open streams in this process (EventHub)
+#
+# Two backends, picked like app/versions.py:
+#   - in-process: buffer + fan-out in this process only. Events published by a Celery
+#     worker process (or another API worker) never arrive. Fine for one process/eager mode.
+#   - Redis (REDIS_URL): buffer = a Redis stream per user (XADD MAXLEN ~), live delivery =
+#     one pub/sub channel that every API worker listens to and fans out locally. So an
+#     event from any API worker or Celery worker reaches streams on every API worker.
+#
+# Order: the live fan-out is only a doorbell. Two publishers can hand their events to it in
+# the other order than their ids (ids are taken in XADD/under a lock, the fan-out happens
+# after), so a stream that sent the newer event would skip the older one as "already
+# sent". On every live event the stream reads the buffer after the last id it sent
+# instead (after()), which always returns events in id order.
+#
+# Resume: the browser's EventSource reconnects with Last-Event-ID. If that id is still in
+# the buffer the missed events are replayed first; if not, the stream sends a `reset`
+# event, meaning "you missed something, GET /tasks/ again".
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Iterable, List, Optional, Tuple
+
+from .cache import get_async_redis, get_redis
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "task-events"
+# how long EventSource waits before reconnecting (sent once at the start of a stream)
+RETRY_MS = 3000
+
+
+def _key(user_id: int) -> str:
+    return f"task-events:{user_id}"
+
+
+def id_order(event_id: str) -> Tuple[int, int]:
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+# ---------------------------------
+# LOCAL FAN-OUT (every backend)
+# ---------------------------------
+
+class Subscription:
+    """One open stream. Events arrive on its event loop, from any thread."""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        # set when the stream must end: the client fell too far behind, or the live feed
+        # had a gap. The client reconnects and resumes from the replay buffer.
+        self.closed = False
+
+    def _put(self, event: dict):
+        if self.closed:
+            return
+        if self.queue.qsize() >= settings.events_client_queue_size:
+            self.close()
+        else:
+            self.queue.put_nowait(event)
+
+    def close(self):
+        self.closed = True
+        self.queue.put_nowait(None)
+
+    def _call(self, fn, *args):
+        try:
+            self.loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            pass  # the loop is gone, so is the stream
+
+    def deliver(self, event: dict):
+        self._call(self._put, event)
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Next event, or None after `timeout` seconds (time for a keep-alive) or once closed."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventHub:
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def deliver(self, user_id: int, events: Iterable[dict]):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            for event in events:
+                subscription.deliver(event)
+
+    def drop_all(self):
+        # the live feed had a gap: end every stream, clients resume from the buffer
+        with self._lock:
+            subscribers = [s for group in self._subscribers.values() for s in group]
+        for subscription in subscribers:
+            subscription._call(subscription.close)
+
+
+# ---------------------------------
+# BACKENDS
+# ---------------------------------
+
+class InProcessEvents:
+    def __init__(self):
+        self.hub = EventHub()
+        self._buffers = OrderedDict()  # user_id -> deque of events, LRU over users
+        self._lock = threading.Lock()
+        self._last = (0, 0)
+
+    def _next_id(self) -> str:
+        ms = int(time.time() * 1000)
+        last_ms, last_seq = self._last
+        self._last = (ms, 0) if ms > last_ms else (last_ms, last_seq + 1)
+        return f"{self._last[0]}-{self._last[1]}"
+
+    def publish(self, user_id: int, events: List[Tuple[str, dict]]):
+        if not events:
+            return
+        with self._lock:
+            stamped = [{"id": self._next_id(), "type": kind, "data": data} for kind, data in events]
+            buffer = self._buffers.pop(user_id, None) or deque(maxlen=settings.events_replay_size)
+            buffer.extend(stamped)
+            self._buffers[user_id] = buffer
+            while len(self._buffers) > settings.events_max_users:
+                self._buffers.popitem(last=False)
+        self.hub.deliver(user_id, stamped)
+
+    async def apublish(self, user_id: int, events: List[Tuple[str, dict]]):
+        self.publish(user_id, events)
+
+    async def replay(self, user_id: int, last_id: str) -> Optional[List[dict]]:
+        """Events after last_id, or None when last_id is no longer in the buffer."""
+        with self._lock:
+            buffer = list(self._buffers.get(user_id, ()))
+        for index, event in enumerate(buffer):
+            if event["id"] == last_id:
+                return buffer[index + 1:]
+        return None
+
+    async def after(self, user_id: int, last_id: str) -> List[dict]:
+        """Buffered events with an id above last_id, oldest first."""
+        with self._lock:
+            buffer = list(self._buffers.get(user_id, ()))
+        last = id_order(last_id)
+        return [event for event in buffer if id_order(event["id"]) > last]
+
+    async def last_id(self, user_id: int) -> str:
+        with self._lock:
+            buffer = self._buffers.get(user_id)
+            return buffer[-1]["id"] if buffer else "0-0"
+
+    async def start(self):
+        pass
+
+
+class RedisEvents:
+    def __init__(self):
+        self.hub = EventHub()
+        self._listener = None
+
+    @staticmethod
+    def _stream_args(events):
+        return [{"type": kind, "data": json.dumps(data)} for kind, data in events]
+
+    @staticmethod
+    def _stamped(ids, events) -> List[dict]:
+        return [{"id": event_id.decode() if isinstance(event_id, bytes) else event_id, "type": kind, "data": data}
+                for event_id, (kind, data) in zip(ids, events)]
+
+    def publish(self, user_id: int, events: List[Tuple[str, dict]]):
+        # sync: Celery tasks and threadpool code
+        if not events:
+            return
+        pipe = get_redis().pipeline(transaction=False)
+        for fields in self._stream_args(events):
+            pipe.xadd(_key(user_id), fields, maxlen=settings.events_replay_size, approximate=True)
+        pipe.expire(_key(user_id), settings.events_replay_ttl)
+        ids = pipe.execute()[:-1]
+        get_redis().publish(CHANNEL, json.dumps({"user_id": user_id, "events": self._stamped(ids, events)}))
+
+    async def apublish(self, user_id: int, events: List[Tuple[str, dict]]):
+        if not events:
+            return
+        pipe = get_async_redis().pipeline(transaction=False)
+        for fields in self._stream_args(events):
+            pipe.xadd(_key(user_id), fields, maxlen=settings.events_replay_size, approximate=True)
+        pipe.expire(_key(user_id), settings.events_replay_ttl)
+        ids = (await pipe.execute())[:-1]
+        await get_async_redis().publish(CHANNEL, json.dumps({"user_id": user_id,
+                                                             "events": self._stamped(ids, events)}))
+
+    @staticmethod
+    def _decoded(entries) -> List[dict]:
+        return [{"id": entry_id.decode(), "type": fields[b"type"].decode(), "data": json.loads(fields[b"data"])}
+                for entry_id, fields in entries]
+
+    async def replay(self, user_id: int, last_id: str) -> Optional[List[dict]]:
+        try:
+            entries = await get_async_redis().xrange(_key(user_id), min=last_id, max="+",
+                                                     count=settings.events_replay_size + 1)
+        except Exception:  # a malformed Last-Event-ID is a ResponseError: treat it as unknown
+            return None
+        if not entries or entries[0][0].decode() != last_id:
+            return None
+        return self._decoded(entries[1:])
+
+    async def after(self, user_id: int, last_id: str) -> List[dict]:
+        # "(" = exclusive start (Redis 6.2+)
+        entries = await get_async_redis().xrange(_key(user_id), min=f"({last_id}", max="+",
+                                                 count=settings.events_replay_size)
+        return self._decoded(entries)
+
+    async def last_id(self, user_id: int) -> str:
+        entries = await get_async_redis().xrevrange(_key(user_id), max="+", min="-", count=1)
+        return entries[0][0].decode() if entries else "0-0"
+
+    async def start(self):
+        # one listener per process, started by the first stream
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            pubsub = get_async_redis().pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    self.hub.deliver(payload["user_id"], payload["events"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Task event listener lost Redis, reconnecting")
+                self.hub.drop_all()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+event_bus = RedisEvents() if settings.redis_url else InProcessEvents()
+
+
+# ---------------------------------
+# EVENT PAYLOADS
+# ---------------------------------
+
+def task_event(kind: str, task) -> Tuple[str, dict]:
+    from . import schemas
+    return kind, schemas.TaskResponse.model_validate(task).model_dump(mode="json")
+
+
+def deleted_event(task_id: int) -> Tuple[str, dict]:
+    return "task.deleted", {"id": task_id}
+
+
+def publish_quietly(user_id: int, events: List[Tuple[str, dict]]):
+    """For Celery tasks: the change feed is best effort, never fail (or retry) the job over it."""
+    try:
+        event_bus.publish(user_id, events)
+    except Exception:
+        logger.exception(f"Could not publish {len(events)} task events for user {user_id}")
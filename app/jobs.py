@@ -0,0 +1,129 @@
+# --------------------------------
+# purpose: compact job-status store for Celery tasks, read by GET /jobs/{id}.
+# target: Cloud Task Manager API
+# --------------------------------
+
+# app/jobs.py
+
+# DEVNOTE: replaces the rpc:// result backend. rpc:// sends results back over the
+# publishing connection, so only the API process that queued a job could ever read it.
+# Here every state change is written (by Celery signals) to a small record:
+#   Redis hash "job:<id>" when REDIS_URL is set (shared by API and workers), or
+#   an in-process TTL dict otherwise (only useful with eager Celery / tests).
+# Records expire after job_status_ttl seconds.
+
+import json
+from datetime import datetime, timezone
+from typing import Optional
+
+from .cache import TTLCache, get_async_redis, get_redis
+from .config import settings
+
+# keep stored results small, this is a status store, not a result backend
+MAX_RESULT_CHARS = 2000
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class InMemoryJobStore:
+    def __init__(self):
+        self._jobs = TTLCache(max_entries=settings.job_status_max_entries)
+
+    def update(self, job_id: str, **fields):
+        job = dict(self._jobs.get(job_id) or {"id": job_id})
+        job.update({k: v for k, v in fields.items() if v is not None}, updated_at=_now())
+        self._jobs.set(job_id, job, settings.job_status_ttl)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._jobs.get(job_id)
+
+    async def aget(self, job_id: str) -> Optional[dict]:
+        return self.get(job_id)
+
+
+class RedisJobStore:
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"job:{job_id}"
+
+    def update(self, job_id: str, **fields):
+        mapping = {"id": job_id, "updated_at": _now(),
+                   **{k: v for k, v in fields.items() if v is not None}}
+        pipe = get_redis().pipeline()
+        pipe.hset(self._key(job_id), mapping=mapping)
+        pipe.expire(self._key(job_id), settings.job_status_ttl)
+        pipe.execute()
+
+    @staticmethod
+    def _decode(raw: dict) -> Optional[dict]:
+        if not raw:
+            return None
+        job = {k.decode(): v.decode() for k, v in raw.items()}
+        if "owner_id" in job:
+            job["owner_id"] = int(job["owner_id"])
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._decode(get_redis().hgetall(self._key(job_id)))
+
+    async def aget(self, job_id: str) -> Optional[dict]:
+        return self._decode(await get_async_redis().hgetall(self._key(job_id)))
+
+
+job_store = RedisJobStore() if settings.redis_url else InMemoryJobStore()
+
+
+def _owner_from(kwargs: Optional[dict]) -> Optional[int]:
+    # our user-facing tasks are dispatched with a user_id keyword argument
+    return (kwargs or {}).get("user_id")
+
+
+def _short(value) -> str:
+    text = json.dumps(value, default=str)
+    # too big: keep the start, stored as a JSON string so it still decodes
+    return text if len(text) <= MAX_RESULT_CHARS else json.dumps(text[:MAX_RESULT_CHARS])
+
+
+# ---------------------------------
+# CELERY SIGNALS -> STATE TRANSITIONS
+# QUEUED (API, on publish) -> STARTED -> RETRY ... -> SUCCESS | FAILURE (worker)
+# ---------------------------------
+
+# connected by app/celery_app.py, so importing job_store (GET /jobs) doesn't import Celery
+def connect_signals():
+    from celery import signals
+    signals.before_task_publish.connect(_on_publish)
+    signals.task_prerun.connect(_on_start)
+    signals.task_retry.connect(_on_retry)
+    signals.task_success.connect(_on_success)
+    signals.task_failure.connect(_on_failure)
+
+
+def _on_publish(sender=None, headers=None, body=None, **kwargs):
+    headers = headers or {}
+    job_id = headers.get("id")
+    if not job_id:
+        return
+    task_kwargs = body[1] if isinstance(body, (list, tuple)) and len(body) > 1 else {}
+    job_store.update(job_id, name=sender, state="QUEUED", owner_id=_owner_from(task_kwargs),
+                     queued_at=_now())
+
+
+def _on_start(task_id=None, task=None, kwargs=None, **extra):
+    job_store.update(task_id, name=task.name, state="STARTED", owner_id=_owner_from(kwargs),
+                     started_at=_now())
+
+
+def _on_retry(request=None, reason=None, **extra):
+    job_store.update(request.id, state="RETRY", error=str(reason)[:MAX_RESULT_CHARS])
+
+
+def _on_success(sender=None, result=None, **extra):
+    job_store.update(sender.request.id, state="SUCCESS", result=_short(result), finished_at=_now())
+
+
+def _on_failure(task_id=None, exception=None, **extra):
+    job_store.update(task_id, state="FAILURE", error=repr(exception)[:MAX_RESULT_CHARS],
+                     finished_at=_now())
@@ -7,17 +7,18 @@
 # app/main.py
 
 # 1. Import the FastAPI class from the fastapi library
-from fastapi import FastAPI
-# here i should Import models to ensure they are registered before creating tables(mentioned in official docs! lol)
-from . import models
-from .database import engine  # Imports the engine from database.py
-from .routers import task, user, auth
-from . import celery_app, tasks  # Import Celery for task autodiscovery
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse, Response
+from .database import pool_status
+from .routers import task, user, auth, job
+from . import utils
+from . import metrics
+from . import admission
 
-
-# DOCS_MENTIONED: "SQLAlchemy will look at all the classes that inherit from Base (in models.py)
-# and generate the corresponding SQL "CREATE TABLE" statements."
-models.Base.metadata.create_all(bind=engine)
+# DEVNOTE: importing this module must stay cheap and must not need the database:
+#   - tables are created by `python -m app.bootstrap` (run once before the API starts)
+#   - Celery is imported on the first dispatch (app/dispatch.py), not here
 
 
 # 2. Create an instance of the FastAPI class
@@ -25,19 +26,41 @@ models.Base.metadata.create_all(bind=engine)
 
 # DOUBT__: instance here is like server? answer: Yes, the 'app' instance created from the FastAPI class acts as the
 # -- main application or server that will handle incoming HTTP requests and route them to the appropriate functions.
+# DEVNOTE: lifespan = code that runs once at startup (before yield) and at shutdown (after).
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    utils.shutdown_executor()  # stop the Argon2 worker processes
+
+
 app = FastAPI(
     title="Distributed Task Processing Platform",
     description="A containerized platform for task management and distributed background processing.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
 )
 
+
+# The password hashing pool is full: fail fast so logins don't pile up.
+@app.exception_handler(utils.PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: utils.PasswordHasherBusy):
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        content={"detail": "Authentication is busy, please retry shortly"},
+                        headers={"Retry-After": "1"})
+
+# 429/503 + Retry-After before a request can queue for the threadpool or the DB pool
+# (see app/admission.py). Added first = runs inside TimingMiddleware, so rejections are timed too.
+app.add_middleware(admission.AdmissionMiddleware)
+
+# request timing -> Prometheus + Server-Timing header (see app/metrics.py)
+app.add_middleware(metrics.TimingMiddleware)
+
 app.include_router(auth.router)  # we add auth router
 app.include_router(user.router)  # we add user router
-app.include_router(task.router)  # we add task router after auth and user.
-
 # Include the router in our main app instance.
 # All endpoints defined in 'task.router' will now be part of our application.
-app.include_router(task.router)
+app.include_router(task.router)  # we add task router after auth and user.
+app.include_router(job.router)  # background job status
 
 
 # 3. Define a "path operation decorator"
@@ -68,3 +91,18 @@ def health_check():
     A simple health check endpoint to confirm the API is running.
     """
     return {"status": "ok"}
+
+
+# Connection pool numbers for this process: checked out, overflow, acquire wait, timeouts.
+# DEVNOTE: use it to size db_pool_size against worker count and Postgres max_connections.
+@app.get("/health/pool")
+def pool_health():
+    return pool_status()
+
+
+# Prometheus scrape endpoint: request/DB/hashing/publish timings of this API
+# (all API processes when PROMETHEUS_MULTIPROC_DIR is set).
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.metrics_payload()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,237 @@
+# --------------------------------
+# purpose: Prometheus metrics + Server-Timing for the API, the DB and Celery.
+# target: Cloud Task Manager API
+# --------------------------------
+
+# app/metrics.py
+
+# DEVNOTE: one place that answers "where did this request spend its time?"
+#   - TimingMiddleware (pure ASGI) starts a per-request bucket in a contextvar
+#   - SQLAlchemy cursor events, timed() blocks (jwt, user lookup, hashing, publish)
+#     add to that bucket AND to the Prometheus histograms
+#   - on the way out the bucket becomes a Server-Timing header, e.g.
+#       Server-Timing: db;dur=3.1;desc="2 queries", auth;dur=0.2, app;dur=5.4
+#   - Celery signals measure queue wait (publish -> start) and task runtime
+# run_in_threadpool copies the context, so DB work on the threadpool (sync mode)
+# still lands in the request's bucket.
+#
+# More than one process (uvicorn workers, prefork children)? Set
+# PROMETHEUS_MULTIPROC_DIR to an empty directory and every process writes its
+# numbers there; /metrics then adds them up.
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram,
+                               REGISTRY, generate_latest, multiprocess, start_http_server)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+# the Server-Timing names for the timed() operations
+TIMING_GROUPS = {
+    "jwt_verify": "auth",
+    "user_lookup": "auth",
+    "password_hash": "hash",
+    "password_verify": "hash",
+    "broker_publish": "publish",
+}
+
+# ---------------------------------
+# METRICS
+# ---------------------------------
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"])
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time until the response headers were sent", ["method", "route"])
+DB_STATEMENTS = Counter(
+    "db_statements_total", "SQL statements executed")
+DB_LATENCY = Histogram(
+    "db_statement_duration_seconds", "SQL statement execution time",
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+DB_PER_REQUEST = Histogram(
+    "db_statements_per_request", "SQL statements per HTTP request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100))
+ADMISSION_REJECTED = Counter(
+    "http_requests_rejected_total", "Requests refused by app/admission.py", ["reason"])
+OPERATION_LATENCY = Histogram(
+    "app_operation_duration_seconds", "Timed steps inside requests", ["operation"])
+CELERY_QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds", "Time between publish and start on a worker", ["task"],
+    buckets=(.005, .01, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 300))
+CELERY_RUNTIME = Histogram(
+    "celery_task_runtime_seconds", "Task run time on the worker", ["task", "state"],
+    buckets=(.005, .01, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 300))
+
+
+# ---------------------------------
+# PER-REQUEST BUCKET
+# ---------------------------------
+
+_request_timings: ContextVar[Optional[dict]] = ContextVar("request_timings", default=None)
+
+
+def _add(name: str, seconds: float, count: int = 1):
+    timings = _request_timings.get()
+    if timings is not None:
+        entry = timings.setdefault(name, [0, 0.0])
+        entry[0] += count
+        entry[1] += seconds
+
+
+@contextmanager
+def timed(operation: str):
+    """Time a block: histogram by operation + the request's Server-Timing bucket."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        OPERATION_LATENCY.labels(operation).observe(elapsed)
+        _add(TIMING_GROUPS.get(operation, operation), elapsed)
+
+
+def server_timing(timings: dict, total: float) -> str:
+    parts = []
+    for name, (count, seconds) in timings.items():
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if name == "db":
+            part += f';desc="{count} queries"'
+        parts.append(part)
+    parts.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# ---------------------------------
+# SQLALCHEMY HOOKS (every engine, sync or behind an AsyncEngine)
+# ---------------------------------
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    DB_STATEMENTS.inc()
+    DB_LATENCY.observe(elapsed)
+    _add("db", elapsed)
+
+
+@event.listens_for(Engine, "handle_error")
+def _on_error(context):
+    # the statement failed, after_cursor_execute won't run: drop its start time
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+# ---------------------------------
+# ASGI MIDDLEWARE
+# ---------------------------------
+
+class TimingMiddleware:
+    """Pure ASGI (no BaseHTTPMiddleware), so the endpoint runs in our context."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = time.perf_counter() - start
+                _observe(scope, status_code, elapsed, timings)
+                if settings.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(timings, elapsed).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+
+
+def _observe(scope, status_code: int, elapsed: float, timings: dict):
+    route = scope.get("route")
+    # the path template (/tasks/{id}), never the raw path: one series per route
+    label = getattr(route, "path", None) or "unmatched"
+    HTTP_REQUESTS.labels(scope["method"], label, str(status_code)).inc()
+    HTTP_LATENCY.labels(scope["method"], label).observe(elapsed)
+    DB_PER_REQUEST.labels(label).observe(timings.get("db", (0, 0.0))[0])
+
+
+# ---------------------------------
+# EXPOSITION
+# ---------------------------------
+
+def _registry():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_payload():
+    """(body, content type) for GET /metrics."""
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int):
+    # for Celery workers, which have no HTTP server of their own
+    start_http_server(port, registry=_registry())
+
+
+# ---------------------------------
+# CELERY SIGNALS
+# ---------------------------------
+
+# DEVNOTE: the publisher stamps the message, the worker compares with its own clock
+# when the task starts. Clock skew between hosts shows up as wait, keep NTP on.
+
+_task_started = {}
+
+
+# connected by app/celery_app.py (the API imports Celery only on its first dispatch)
+def connect_signals():
+    from celery import signals
+    signals.before_task_publish.connect(_stamp_publish)
+    signals.task_prerun.connect(_on_task_start)
+    signals.task_postrun.connect(_on_task_end)
+
+
+def _stamp_publish(headers=None, **kwargs):
+    if headers is not None:
+        headers["published_at"] = time.time()
+
+
+def _on_task_start(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    published_at = getattr(task.request, "published_at", None)
+    if published_at:
+        CELERY_QUEUE_WAIT.labels(task.name).observe(max(time.time() - published_at, 0.0))
+
+
+def _on_task_end(task_id=None, task=None, state=None, **kwargs):
+    start = _task_started.pop(task_id, None)
+    if start is not None:
+        CELERY_RUNTIME.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - start)
@@ -8,22 +8,40 @@
 
 # app/models.py
 
+from datetime import datetime, timezone
+
 # DevNote: Add 'ForeignKey' and 'relationship' to the imports
-from sqlalchemy import Column, Integer, String, Boolean, text, ForeignKey
+from sqlalchemy import DDL, Column, Integer, String, Boolean, ForeignKey, Index, event, false, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from .database import Base
 
 
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+# DEVNOTE: func.now() / false() render as now() / false on Postgres and as
+# CURRENT_TIMESTAMP / 0 on sqlite, so the same models work for local testing.
+
+
 class Task(Base):
     __tablename__ = "tasks"
 
     id = Column(Integer, primary_key=True, nullable=False)
     title = Column(String, nullable=False)
     content = Column(String, nullable=False)
-    completed = Column(Boolean, server_default='FALSE', nullable=False)
+    completed = Column(Boolean, server_default=false(), nullable=False)
     created_at = Column(TIMESTAMP(timezone=True),
-                        nullable=False, server_default=text('now()'))
+                        nullable=False, server_default=func.now())
+    # optional deadline, the overdue scanner (tasks.mark_overdue_tasks) looks at this
+    due_date = Column(TIMESTAMP(timezone=True), nullable=True)
+    # last insert/update. The overdue scanner uses it to find tasks saved with a deadline
+    # already behind its high-water mark. Set by SQLAlchemy from the app's clock, like the
+    # mark itself (sqlite's CURRENT_TIMESTAMP has whole seconds and would sort before a
+    # mark taken in the same second). No DB default, so databases upgraded by app.bootstrap
+    # behave the same; rows from before the upgrade stay NULL.
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=True, default=_utcnow, onupdate=_utcnow)
 
     # --- THIS IS THE MISSING PIECE ---
     # This column links a task to a user.
@@ -34,6 +52,67 @@ class Task(Base):
     owner = relationship("User")
     # ---------------------------------
 
+    # DEVNOTE: GET /tasks/ seeks on (owner_id, id), so this composite index turns
+    # every page into an index range scan instead of a filtered scan of all tasks.
+    __table_args__ = (
+        Index("ix_tasks_owner_id_id", "owner_id", "id"),
+    )
+
+
+# DEVNOTE: partial index, only incomplete tasks with a deadline are in it. The overdue
+# scanner asks "incomplete and due between X and Y", which is a range scan here and
+# the index stays small because completed tasks drop out of it.
+Index("ix_tasks_due_date_incomplete", Task.due_date,
+      postgresql_where=(Task.completed == false()) & Task.due_date.isnot(None),
+      sqlite_where=(Task.completed == false()) & Task.due_date.isnot(None))
+# same rows, by last change: "incomplete, has a deadline, saved since X"
+Index("ix_tasks_updated_at_incomplete", Task.updated_at,
+      postgresql_where=(Task.completed == false()) & Task.due_date.isnot(None),
+      sqlite_where=(Task.completed == false()) & Task.due_date.isnot(None))
+
+
+# ---------------------------------
+# FULL-TEXT SEARCH (GET /tasks/search)
+# ---------------------------------
+
+# DEVNOTE: not mapped on Task on purpose: the column only exists on Postgres, and
+# select(Task) has to work on both. crud.search_tasks refers to it by name.
+#   Postgres: generated tsvector column (kept up to date by the DB itself) + GIN index
+#   sqlite:   FTS5 external-content table over tasks, synced by triggers
+# Both are created right after the tasks table by create_all (after_create).
+SEARCH_CONFIG = "english"
+
+POSTGRES_SEARCH_DDL = [
+    f"""ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+]
+
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, content, content='tasks', content_rowid='id', tokenize='porter')""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    # only when the text changed, completing a task doesn't touch the index
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, content ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO tasks_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+]
+
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+# the FTS table is not in the metadata, drop_all has to remove it itself
+event.listen(Task.__table__, "after_drop",
+             DDL("DROP TABLE IF EXISTS tasks_fts").execute_if(dialect="sqlite"))
+
 # Define the User model!
 
 
@@ -44,7 +123,33 @@ class User(Base):
     email = Column(String, nullable=False, unique=True)
     password = Column(String, nullable=False)
     created_at = Column(TIMESTAMP(timezone=True),
-                        nullable=False, server_default=text('now()'))
+                        nullable=False, server_default=func.now())
 # DEVNOTE__: we create a class for each table in the database.
 # DEVNOTE__:var = Column(DataType, options) is pattern to define columns in SQLAlchemy models.
 # DEVNOTE__:we have different parameters that can be found in docs easily..!
+
+
+# High-water marks for incremental background scans (one row per scanner).
+# DEVNOTE: the overdue scanner stores "checked everything due up to high_water" here,
+# so the next run only looks at tasks that became due after that.
+class ScanCheckpoint(Base):
+    __tablename__ = "scan_checkpoints"
+
+    name = Column(String, primary_key=True)
+    high_water = Column(TIMESTAMP(timezone=True), nullable=False)
+    updated_at = Column(TIMESTAMP(timezone=True),
+                        nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+# Per-user task counters for GET /tasks/stats (incomplete = total - completed).
+# DEVNOTE: crud updates these in the same transaction as every task write, so reading
+# stats is one primary-key lookup. tasks.reconcile_task_stats repairs any drift
+# (rows changed outside the API, counters from before this table existed).
+class TaskStats(Base):
+    __tablename__ = "task_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total = Column(Integer, nullable=False, server_default="0")
+    completed = Column(Integer, nullable=False, server_default="0")
+    updated_at = Column(TIMESTAMP(timezone=True),
+                        nullable=False, server_default=func.now(), onupdate=func.now())
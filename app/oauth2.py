@@ -9,10 +9,16 @@
 # importing jwt, datetime, timedelta, timezone...
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
-from . import schemas, database, models
+import asyncio
+import hashlib
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from . import schemas, database, models, metrics
+from .cache import make_cache
 from fastapi import Depends, status, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from .config import settings
 
 
@@ -51,22 +57,140 @@ def verify_access_token(token: str, credentials_exception):
         user_id: str = payload.get("user_id")
         if user_id is None:
             raise credentials_exception
-        token_data = {"id": user_id}  # Can be a more complex schema if needed
+        token_data = {"id": user_id, "exp": payload.get("exp")}  # Can be a more complex schema if needed
     except JWTError:
         raise credentials_exception
     return token_data
 
-# Dependency function to get the current user based on the token.
+
+# ---------------------------------
+# VERIFIED TOKEN + CURRENT USER CACHE
+# ---------------------------------
+
+# DEVNOTE: every authenticated request used to pay one JWT verify + one SELECT on users.
+# Verified tokens are cached by their sha256 (never the raw token) until the earlier of
+# auth_cache_ttl and the token's own exp, so a cached entry can't outlive the token.
+# User rows are cached by id and dropped whenever the ORM updates or deletes that user.
+token_cache = make_cache("auth:token", max_entries=settings.auth_cache_max_entries)
+user_cache = make_cache("auth:user", max_entries=settings.auth_cache_max_entries)
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
-                                          detail=f"Could not validate credentials",
-                                          headers={"WWW-Authenticate": "Bearer"})
+async def verify_access_token_cached(token: str, credentials_exception):
+    key = _token_key(token)
+    token_data = await token_cache.aget(key)
+    if token_data is not None and token_data["exp"] > time.time():
+        return token_data
 
     token_data = verify_access_token(token, credentials_exception)
+    ttl = min(settings.auth_cache_ttl, token_data["exp"] - time.time()) if token_data["exp"] else 0
+    await token_cache.aset(key, token_data, ttl)
+    return token_data
+
+
+def _user_to_cache(user: models.User) -> dict:
+    # no password hash in the cache, nothing on the request path needs it
+    return {"id": user.id, "email": user.email, "created_at": user.created_at.isoformat()}
+
+
+def _user_from_cache(data: dict) -> models.User:
+    # a detached User: fine for reading id/email, don't add it to a session
+    return models.User(id=data["id"], email=data["email"],
+                       created_at=datetime.fromisoformat(data["created_at"]))
+
+
+def invalidate_user(user_id: int):
+    user_cache.delete(str(user_id))
+
+
+async def ainvalidate_user(user_id: int):
+    await user_cache.adelete(str(user_id))
+
+
+# DEVNOTE: the mapper events fire inside flush. With an AsyncSession that is on the event
+# loop, where RedisCache.delete is a blocking round trip; and it is before the commit, so
+# a request in between could cache the old row again. So the events only note the id on
+# the session, and the entry is dropped once the commit went through:
+#   - on the event loop (AsyncSession): with adelete, in a task
+#   - anywhere else (threadpool ThreadedSession, Celery workers): the blocking delete
+# ORM events only, bulk update()/delete() statements on users must call invalidate_user().
+_PENDING = "invalidate_users"
+_invalidations = set()  # running adelete tasks, referenced until they finish
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _drop_cached_user(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        invalidate_user(target.id)
+    else:
+        session.info.setdefault(_PENDING, set()).add(target.id)
 
-    user = db.query(models.User).filter(
-        models.User.id == token_data["id"]).first()
 
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    user_ids = session.info.pop(_PENDING, None)
+    if not user_ids:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        for user_id in user_ids:
+            invalidate_user(user_id)
+        return
+    for user_id in user_ids:
+        task = loop.create_task(ainvalidate_user(user_id))
+        _invalidations.add(task)
+        task.add_done_callback(_invalidations.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session):
+    session.info.pop(_PENDING, None)
+
+
+def _credentials_exception():
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                         detail=f"Could not validate credentials",
+                         headers={"WWW-Authenticate": "Bearer"})
+
+
+# Dependency: the verified token payload. FastAPI runs it once per request even though
+# both get_read_db and get_current_user depend on it.
+async def get_token_data(token: str = Depends(oauth2_scheme)):
+    with metrics.timed("jwt_verify"):
+        return await verify_access_token_cached(token, _credentials_exception())
+
+
+# Dependency for read-only routes: a replica session, or the primary while this user is
+# pinned after a write (see database.pin_to_primary). Sessions connect lazily, so
+# a write route that only gets this through get_current_user costs nothing when the
+# user is cached.
+async def get_read_db(token_data: dict = Depends(get_token_data)):
+    primary = await database.is_pinned(token_data["id"])
+    async for db in database.get_read_session(primary=primary):
+        yield db
+
+# Dependency function to get the current user based on the token.
+
+
+async def get_current_user(token_data: dict = Depends(get_token_data),
+                           db: AsyncSession = Depends(get_read_db)):
+    credentials_exception = _credentials_exception()
+
+    with metrics.timed("user_lookup"):
+        cached = await user_cache.aget(str(token_data["id"]))
+        if cached is not None:
+            return _user_from_cache(cached)
+
+        # DEVNOTE: db.get is a primary key lookup (and checks the identity map first).
+        user = await db.get(models.User, token_data["id"])
+    if user is None:
+        raise credentials_exception
+
+    await user_cache.aset(str(user.id), _user_to_cache(user), settings.auth_cache_ttl)
     return user
@@ -0,0 +1,39 @@
+# --------------------------------
+# purpose: opaque cursors for keyset (seek) pagination.
+# target: Cloud Task Manager API
+# --------------------------------
+
+# app/pagination.py
+
+# DEVNOTE: keyset pagination remembers the last row we sent instead of an OFFSET.
+# the next page is "WHERE owner_id = :me AND id > :last_id ORDER BY id LIMIT :n",
+# which is a range scan on the (owner_id, id) index no matter how deep the page is.
+# The cursor is base64 so clients treat it as opaque and we can change it later.
+
+import base64
+import json
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+        if not isinstance(last_id, int):
+            raise ValueError("cursor id must be an integer")
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Invalid pagination cursor")
+    return last_id
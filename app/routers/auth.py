@@ -1,7 +1,8 @@
 # app/routers/auth.py
 from fastapi import APIRouter, Depends, status, HTTPException, Response
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import database, schemas, models, utils, oauth2
 
@@ -9,18 +10,26 @@ router = APIRouter(tags=['Authentication'])
 
 
 @router.post('/login')
-def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db), operation_id="login"):
-    user = db.query(models.User).filter(
-        models.User.email == user_credentials.username).first()
+async def login(user_credentials: OAuth2PasswordRequestForm = Depends(),
+                db: AsyncSession = Depends(database.get_async_db), operation_id="login"):
+    user = await db.scalar(select(models.User).where(
+        models.User.email == user_credentials.username))
 
     if not user:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail=f"Invalid Credentials")
 
-    if not utils.verify(user_credentials.password, user.password):
+    # Argon2 runs on the dedicated hashing pool (utils), not on the event loop.
+    valid, new_hash = await utils.verify_and_update_async(user_credentials.password, user.password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail=f"Invalid Credentials")
 
+    # The stored hash used outdated Argon2 parameters, save the re-hashed one.
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
+
     # Create a token
     access_token = oauth2.create_access_token(data={"user_id": user.id})
 
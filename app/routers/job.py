@@ -0,0 +1,30 @@
+# app/routers/job.py
+
+import json
+
+from fastapi import Depends, HTTPException, status, APIRouter
+
+from .. import models, schemas, oauth2
+from ..jobs import job_store
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=['Jobs']
+)
+
+# GET THE STATUS OF A BACKGROUND JOB
+# DEVNOTE: id is the task_id / job_ids returned by the remind endpoints.
+
+
+@router.get("/{id}", response_model=schemas.JobStatus, operation_id="get_job")
+async def get_job(id: str, current_user: models.User = Depends(oauth2.get_current_user)):
+    job = await job_store.aget(id)
+
+    # someone else's job looks exactly like a missing one
+    if job is None or job.get("owner_id") != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Job with id: {id} was not found")
+
+    if job.get("result") is not None:
+        job = {**job, "result": json.loads(job["result"])}
+    return job
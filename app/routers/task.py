@@ -1,13 +1,23 @@
 # app/routers/task.py
 
-from fastapi import Depends, HTTPException, status, APIRouter, Response
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import Depends, HTTPException, status, APIRouter, Response, Query, Request, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from datetime import datetime
+import csv
+import hashlib
+import io
+import json
 import logging
+import uuid
 
-from .. import models, schemas, oauth2
-from ..database import get_db
-from ..tasks import send_task_reminder
+from .. import models, schemas, oauth2, pagination, crud, metrics, dispatch, serialization, events
+from ..versions import task_versions, collection_etag, task_etag, etag_matches
+from ..cache import make_cache
+from ..config import settings
+from ..database import get_async_db, is_pinned, pin_to_primary, stream_batches
 
 
 logger = logging.getLogger(__name__)
@@ -18,128 +28,562 @@ router = APIRouter(
     tags=['Tasks']
 )
 
+# DEVNOTE: the owned-task queries in crud matched nothing. Only now do we probe whether
+# the task exists at all, to answer 404 (missing) vs 403 (belongs to someone else).
+
+
+async def _raise_missing_or_forbidden(db: AsyncSession, id: int, not_found_detail: str):
+    if not await crud.task_exists(db, id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found_detail)
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                        detail="Not authorized to perform requested action")
+
+# Called after every committed change to a user's tasks: new version = new ETags,
+# then the change feed (GET /tasks/events) gets the events.
+
+
+async def _tasks_changed(user_id: int, changes: list):
+    # pin first: a replica read between the two steps must not get the new ETag
+    await pin_to_primary(user_id)
+    await task_versions.abump(user_id)
+    try:
+        await events.event_bus.apublish(user_id, changes)
+    except Exception:
+        # the write is committed: a lost event only means a client refetches later
+        logger.exception(f"Could not publish task events for user {user_id}")
+
+
+def _not_modified(etag: str):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_cache_headers(etag))
+
+
+def _cache_headers(etag: str) -> dict:
+    # no-cache = clients may store it but must revalidate (that's the cheap 304 path)
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
 # CREATE A TASK
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.TaskResponse, operation_id="create_task")
-def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db),
-                current_user: models.User = Depends(oauth2.get_current_user)):
-    new_task = models.Task(owner_id=current_user.id, **task.dict())
-    db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
+async def create_task(task: schemas.TaskCreate, db: AsyncSession = Depends(get_async_db),
+                      current_user: models.User = Depends(oauth2.get_current_user)):
+    new_task = await crud.create_task(db, current_user.id, task.dict())
+    await db.commit()
+    await _tasks_changed(current_user.id, [events.task_event("task.created", new_task)])
     return new_task
 
 # GET ALL TASKS
 
 
-@router.get("/", response_model=List[schemas.TaskResponse], operation_id="get_all_tasks")
-def get_tasks(db: Session = Depends(get_db),
-              current_user: models.User = Depends(oauth2.get_current_user)):
-    tasks = db.query(models.Task).filter(
-        models.Task.owner_id == current_user.id).all()
-    return tasks
+@router.get("/", response_model=schemas.TaskPage, operation_id="get_all_tasks")
+async def get_tasks(request: Request,
+                    db: AsyncSession = Depends(oauth2.get_read_db),
+                    current_user: models.User = Depends(oauth2.get_current_user),
+                    if_none_match: Optional[str] = Header(None),
+                    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+                    cursor: Optional[str] = None,
+                    completed: Optional[bool] = None,
+                    created_after: Optional[datetime] = None,
+                    created_before: Optional[datetime] = None,
+                    fields: Optional[str] = Query(None, description="Comma-separated task fields to return, "
+                                                  "e.g. title,completed (id is always included)")):
+    """
+    Return one page of the current user's tasks, ordered by id.
+
+    Pages are seeked on (owner_id, id) so every page costs the same, however deep.
+    Pass the returned next_cursor back as ?cursor= to get the following page.
+    Send the returned ETag as If-None-Match to get a 304 while nothing has changed.
+    Use ?fields= to leave out what you don't need (content can be large).
+    """
+    columns = serialization.parse_fields(fields)
+
+    # the same page with other query params is a different body, so they go in the ETag
+    params = hashlib.sha1(str(sorted(request.query_params.multi_items())).encode()).hexdigest()[:12]
+    etag = collection_etag(current_user.id, await task_versions.aget(current_user.id), params)
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+
+    # Fetch one extra row to know if there is another page without a COUNT(*).
+    rows = await crud.list_tasks(db, current_user.id, columns, limit + 1,
+                                 after_id=pagination.decode_cursor(cursor),
+                                 completed=completed,
+                                 created_after=created_after,
+                                 created_before=created_before)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = pagination.encode_cursor(rows[-1][columns.index("id")])
+
+    # DEVNOTE: a Response skips response_model validation, see app/serialization.py
+    return Response(content=serialization.encode_page(columns, rows, next_cursor),
+                    media_type="application/json", headers=_cache_headers(etag))
+
+# TASK COUNTS
+# DEVNOTE: registered before /{id}. The counters are kept by crud in the same
+# transaction as each write, so this never counts task rows.
+
+
+@router.get("/stats", response_model=schemas.TaskStatsResponse, operation_id="get_task_stats")
+async def get_task_stats(db: AsyncSession = Depends(oauth2.get_read_db),
+                         current_user: models.User = Depends(oauth2.get_current_user)):
+    """Total, completed and incomplete task counts for the current user."""
+    return await crud.get_stats(db, current_user.id)
+
+# SEARCH TASKS (full-text, ranked)
+# DEVNOTE: registered before /{id} like /export. The index does the matching (GIN on
+# Postgres, FTS5 on sqlite), so this replaces "fetch every task and filter on the client".
+# Offsets are fine here because a search never goes deeper than search_top_k rows.
+
+
+@router.get("/search", response_model=schemas.TaskSearchPage, operation_id="search_tasks")
+async def search_tasks(request: Request, response: Response,
+                       q: str = Query(..., min_length=1, max_length=200),
+                       limit: int = Query(20, ge=1, le=settings.search_max_page_size),
+                       offset: int = Query(0, ge=0),
+                       db: AsyncSession = Depends(oauth2.get_read_db),
+                       current_user: models.User = Depends(oauth2.get_current_user),
+                       if_none_match: Optional[str] = Header(None)):
+    """
+    Search the current user's tasks by title and content, best matches first.
+
+    Only the top search_top_k matches are reachable; page through them with limit/offset.
+    """
+    if not q.split():
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                            detail="Search query must contain at least one word")
+
+    params = hashlib.sha1(str(sorted(request.query_params.multi_items())).encode()).hexdigest()[:12]
+    etag = collection_etag(current_user.id, await task_versions.aget(current_user.id), f"search-{params}")
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+
+    limit = min(limit, settings.search_top_k - offset)
+    rows = await crud.search_tasks(db, current_user.id, q, limit, offset) if limit > 0 else []
+
+    items = [{**schemas.TaskResponse.model_validate(task).model_dump(), "rank": rank} for task, rank in rows]
+    next_offset = offset + limit if limit > 0 and len(rows) == limit and offset + limit < settings.search_top_k else None
+
+    response.headers.update(_cache_headers(etag))
+    return {"items": items, "next_offset": next_offset}
+
+# CHANGE FEED (Server-Sent Events)
+# DEVNOTE: registered before /{id}. Replaces polling GET /tasks/: the stream stays open and
+# gets task.created / task.updated / task.deleted / reminder.completed events as they
+# happen (app/events.py). Reconnects send Last-Event-ID and get what they missed.
+
+
+async def _event_stream(user_id: int, last_event_id: Optional[str]):
+    bus = events.event_bus
+    # where a new stream starts: taken before subscribing, everything after it is read once
+    # subscribed, so nothing published in between is lost
+    head = await bus.last_id(user_id)
+    subscription = bus.hub.subscribe(user_id)
+    try:
+        await bus.start()
+        yield f"retry: {events.RETRY_MS}\n\n"
+
+        last_sent, missed = head, None
+        if last_event_id:
+            missed = await bus.replay(user_id, last_event_id)
+            if missed is None:
+                # too old (or from before a restart): the client has to refetch GET /tasks/
+                yield "event: reset\ndata: {}\n\n"
+            else:
+                last_sent = last_event_id
+        if missed is None:
+            missed = await bus.after(user_id, head)
+
+        for event in missed:
+            yield events.format_sse(event)
+            last_sent = event["id"]
+
+        while True:
+            event = await subscription.get(settings.events_heartbeat_seconds)
+            if subscription.closed:
+                return
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            # already sent: it was in the replay or in an earlier read of the buffer
+            if events.id_order(event["id"]) <= events.id_order(last_sent):
+                continue
+            # the live event is a doorbell: send the buffer after last_sent, in id order,
+            # so an older event that is still on its way through the fan-out isn't skipped
+            for buffered in await bus.after(user_id, last_sent):
+                yield events.format_sse(buffered)
+                last_sent = buffered["id"]
+            if events.id_order(event["id"]) > events.id_order(last_sent):
+                # no longer buffered (evicted): send it as it came
+                yield events.format_sse(event)
+                last_sent = event["id"]
+    finally:
+        bus.hub.unsubscribe(subscription)
+
+
+@router.get("/events", operation_id="task_events", responses={200: {"content": {"text/event-stream": {}}}})
+async def task_events(last_event_id: Optional[str] = Header(None),
+                      db: AsyncSession = Depends(oauth2.get_read_db),
+                      current_user: models.User = Depends(oauth2.get_current_user)):
+    """
+    Stream changes to the current user's tasks as Server-Sent Events.
+
+    Event types: task.created, task.updated (data = the task), task.deleted (data = {"id"}),
+    reminder.completed (data = {"task_id", "job_id"}). A `reset` event means events were
+    missed and GET /tasks/ should be fetched again. Reconnect with the Last-Event-ID header
+    to resume.
+    """
+    # the stream can stay open for hours: give the user lookup's connection back now
+    await db.close()
+    return StreamingResponse(_event_stream(current_user.id, last_event_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# EXPORT ALL TASKS (streamed)
+# DEVNOTE: must be registered before /{id}, otherwise "export" is parsed as an id.
+
+# Same fields as TaskResponse, so an export line looks like an API task.
+EXPORT_FIELDS = list(schemas.TaskResponse.model_fields)
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _ndjson_chunk(rows) -> str:
+    return "".join(json.dumps({name: _export_value(value) for name, value in row._mapping.items()}) + "\n"
+                   for row in rows)
+
+
+def _csv_chunk(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows([_export_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+@router.get("/export", operation_id="export_tasks",
+            responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}})
+async def export_tasks(format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+                       after_id: Optional[int] = Query(None, description="Resume after this task id"),
+                       db: AsyncSession = Depends(oauth2.get_read_db),
+                       current_user: models.User = Depends(oauth2.get_current_user)):
+    """
+    Stream every task of the current user as NDJSON (one JSON object per line) or CSV.
+
+    Rows are read through a server-side cursor and written as they arrive, so memory
+    stays flat for any number of tasks. Ordered by id: if a download breaks, call
+    again with after_id=<last id you received> to continue from there.
+    """
+    statement = crud.export_statement(current_user.id, EXPORT_FIELDS, after_id)
+    pinned = await is_pinned(current_user.id)
+    # the stream reads on its own connection: give the user lookup's back now, or a slow
+    # download holds two (same as /events)
+    await db.close()
+
+    async def body():
+        first = True
+        async for rows in stream_batches(statement, settings.export_batch_size, replica=not pinned):
+            yield _ndjson_chunk(rows) if format == "ndjson" else _csv_chunk(rows, header=first)
+            first = False
+        if first and format == "csv":
+            yield _csv_chunk([], header=True)
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(body(), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'})
 
 # GET A SPECIFIC TASK
 
 
 @router.get("/{id}", response_model=schemas.TaskResponse, operation_id="get_one_task")
-def get_task(id: int, db: Session = Depends(get_db),
-             current_user: models.User = Depends(oauth2.get_current_user)):
-    task = db.query(models.Task).filter(models.Task.id == id).first()
+async def get_task(id: int, response: Response, db: AsyncSession = Depends(oauth2.get_read_db),
+                   current_user: models.User = Depends(oauth2.get_current_user),
+                   if_none_match: Optional[str] = Header(None)):
+    etag = task_etag(id, current_user.id, await task_versions.aget(current_user.id))
+    # a matching tag (or "*") only means "not modified" for a task that exists and is
+    # yours: check that with the id/owner lookup, no row load. Anything else goes on to
+    # the normal 404/403 below.
+    if etag_matches(if_none_match, etag) and await crud.task_owners(db, [id]) == {id: current_user.id}:
+        return _not_modified(etag)
+
+    task = await crud.get_owned_task(db, id, current_user.id)
 
-    if not task:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f"Task with id: {id} was not found")
+    if task is None:
+        await _raise_missing_or_forbidden(db, id, f"Task with id: {id} was not found")
 
-    if task.owner_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                            detail="Not authorized to perform requested action")
+    response.headers.update(_cache_headers(etag))
     return task
 
 # DELETE A TASK
 
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT, operation_id="delete_task")
-def delete_task(id: int, db: Session = Depends(get_db),
-                current_user: models.User = Depends(oauth2.get_current_user)):
-    task_query = db.query(models.Task).filter(models.Task.id == id)
-    task = task_query.first()
+async def delete_task(id: int, db: AsyncSession = Depends(get_async_db),
+                      current_user: models.User = Depends(oauth2.get_current_user)):
+    if not await crud.delete_owned_task(db, id, current_user.id):
+        await _raise_missing_or_forbidden(db, id, f"Task with id: {id} does not exist")
 
-    if task is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f"Task with id: {id} does not exist")
-
-    if task.owner_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                            detail="Not authorized to perform requested action")
-
-    task_query.delete(synchronize_session=False)
-    db.commit()
+    await db.commit()
+    await _tasks_changed(current_user.id, [events.deleted_event(id)])
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # UPDATE A TASK
 
 
 @router.put("/{id}", response_model=schemas.TaskResponse, operation_id="update_task")
-def update_task(id: int, updated_task: schemas.TaskCreate, db: Session = Depends(get_db),
-                current_user: models.User = Depends(oauth2.get_current_user)):
-    task_query = db.query(models.Task).filter(models.Task.id == id)
-    task = task_query.first()
+async def update_task(id: int, updated_task: schemas.TaskCreate, db: AsyncSession = Depends(get_async_db),
+                      current_user: models.User = Depends(oauth2.get_current_user)):
+    task = await crud.update_owned_task(db, id, current_user.id, updated_task.dict())
 
     if task is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f"Task with id: {id} does not exist")
+        await _raise_missing_or_forbidden(db, id, f"Task with id: {id} does not exist")
 
-    if task.owner_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                            detail="Not authorized to perform requested action")
+    await db.commit()
+    await _tasks_changed(current_user.id, [events.task_event("task.updated", task)])
+    return task
 
-    task_query.update(updated_task.dict(), synchronize_session=False)
-    db.commit()
-    return task_query.first()
+# BULK OPERATIONS
+# DEVNOTE: one ownership query + one write statement + one commit per batch,
+# instead of a round trip and a commit per task. Results come back per item,
+# so one bad id doesn't fail the whole batch.
+
+
+def _check_batch_size(items):
+    if len(items) > settings.bulk_max_items:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                            detail=f"At most {settings.bulk_max_items} items per bulk request")
+
+
+def _ownership_result(task_id, owners, current_user):
+    if task_id not in owners:
+        return schemas.BulkItemResult(id=task_id, status="not_found")
+    if owners[task_id] != current_user.id:
+        return schemas.BulkItemResult(id=task_id, status="forbidden")
+    return None
+
+
+@router.post("/bulk", status_code=status.HTTP_201_CREATED, response_model=schemas.BulkResult,
+             operation_id="bulk_create_tasks")
+async def bulk_create_tasks(tasks: List[schemas.TaskCreate], db: AsyncSession = Depends(get_async_db),
+                            current_user: models.User = Depends(oauth2.get_current_user)):
+    _check_batch_size(tasks)
+    if not tasks:
+        return {"results": []}
+
+    created = await crud.create_tasks(db, current_user.id, [task.dict() for task in tasks])
+    await db.commit()
+    await _tasks_changed(current_user.id, [events.task_event("task.created", task) for task in created])
+
+    return {"results": [schemas.BulkItemResult(id=task.id, status="created", task=task)
+                        for task in created]}
+
+
+@router.patch("/bulk", response_model=schemas.BulkResult, operation_id="bulk_update_tasks")
+async def bulk_update_tasks(items: List[schemas.TaskBulkUpdate], db: AsyncSession = Depends(get_async_db),
+                            current_user: models.User = Depends(oauth2.get_current_user)):
+    _check_batch_size(items)
+    owners = await crud.task_owners(db, [item.id for item in items])
+
+    # later items win when the same id shows up twice, like applying them in order
+    changes = {}
+    for item in items:
+        if _ownership_result(item.id, owners, current_user) is None:
+            fields = item.dict(exclude_unset=True, exclude={"id"})
+            if fields:
+                changes.setdefault(item.id, {}).update(fields)
+
+    updated = {}
+    if changes:
+        updated = await crud.update_owned_tasks(db, current_user.id, changes)
+        await db.commit()
+        await _tasks_changed(current_user.id, [events.task_event("task.updated", task)
+                                               for task in updated.values()])
+
+    results = []
+    for item in items:
+        result = _ownership_result(item.id, owners, current_user)
+        if result is None:
+            task = updated.get(item.id)
+            result = schemas.BulkItemResult(id=item.id, status="updated" if task else "unchanged",
+                                            task=task)
+        results.append(result)
+    return {"results": results}
+
+
+@router.post("/bulk/delete", response_model=schemas.BulkResult, operation_id="bulk_delete_tasks")
+async def bulk_delete_tasks(payload: schemas.TaskBulkDelete, db: AsyncSession = Depends(get_async_db),
+                            current_user: models.User = Depends(oauth2.get_current_user)):
+    _check_batch_size(payload.ids)
+    ids = list(dict.fromkeys(payload.ids))  # de-duplicated, order kept: one result per row
+    owners = await crud.task_owners(db, ids)
+
+    owned = [task_id for task_id in ids if owners.get(task_id) == current_user.id]
+    deleted = set()
+    if owned:
+        deleted = await crud.delete_owned_tasks(db, current_user.id, owned)
+        await db.commit()
+        await _tasks_changed(current_user.id, [events.deleted_event(task_id) for task_id in sorted(deleted)])
+
+    results = []
+    for task_id in ids:
+        result = _ownership_result(task_id, owners, current_user)
+        if result is None:
+            result = schemas.BulkItemResult(id=task_id, status="deleted" if task_id in deleted else "not_found")
+        results.append(result)
+    return {"results": results}
 
 # SEND TASK REMINDER (Background Job)
+# DEVNOTE: retry storms / double clicks. Two set-if-absent claims (Redis SET NX when
+# REDIS_URL is set) decide whether we publish at all:
+#   "key:<user>:<Idempotency-Key>" -> same key again replays the first answer (24h)
+#   "task:<task id>"               -> any repeat within reminder_debounce_seconds
+# Duplicates get the job id that is already queued, so nothing new hits the broker.
+# The job id is generated here (before publishing) so it can be stored in the claim.
+
+reminder_claims = make_cache("remind", settings.reminder_claims_max_entries)
+
+
+def _reminder_response(job_id: str, title: str, response: Response, duplicate: bool) -> dict:
+    if duplicate:
+        response.headers["Idempotent-Replayed"] = "true"
+    return {
+        "task_id": job_id,
+        "status": "already_queued" if duplicate else "sent_to_queue",
+        "status_url": f"/jobs/{job_id}",
+        "detail": f"Reminder for task '{title}' "
+                  + ("was already queued" if duplicate else "queued for background processing"),
+    }
 
 
 @router.post("/{id}/remind", status_code=status.HTTP_202_ACCEPTED, operation_id="send_task_reminder")
-def send_reminder(id: int, db: Session = Depends(get_db),
-                  current_user: models.User = Depends(oauth2.get_current_user)):
+async def send_reminder(id: int, response: Response, db: AsyncSession = Depends(get_async_db),
+                        current_user: models.User = Depends(oauth2.get_current_user),
+                        idempotency_key: Optional[str] = Header(None, max_length=255)):
     """
     Trigger a background task to send a reminder for the specified task.
     
     Returns 202 Accepted immediately; the reminder is processed asynchronously.
+    Repeats within the debounce window (or with a used Idempotency-Key) return
+    the job that is already queued instead of queueing another one.
     
     Example response:
     {
         "task_id": "abc123def456...",
         "status": "sent_to_queue",
+        "status_url": "/jobs/abc123def456...",
         "detail": "Reminder queued for background processing"
     }
     """
-    task = db.query(models.Task).filter(models.Task.id == id).first()
-
-    if not task:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f"Task with id: {id} was not found")
-
-    if task.owner_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                            detail="Not authorized to perform requested action")
+    job_id = str(uuid.uuid4())
+    claim = {"job_id": job_id, "task_id": id, "title": None}
+    claimed = []
 
     try:
+        # the idempotency key is per user, so a replay can skip even the ownership query
+        if idempotency_key:
+            key = f"key:{current_user.id}:{idempotency_key}"
+            existing = await reminder_claims.aadd(key, claim, settings.idempotency_key_ttl)
+            if existing is not None:
+                if existing["task_id"] != id:
+                    raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                                        detail="Idempotency-Key was already used for another task")
+                return _reminder_response(existing["job_id"], existing["title"] or str(id), response,
+                                          duplicate=True)
+            claimed.append(key)
+
+        task = await crud.get_owned_task(db, id, current_user.id)
+
+        if task is None:
+            await _raise_missing_or_forbidden(db, id, f"Task with id: {id} was not found")
+
+        claim["title"] = task.title
+        existing = await reminder_claims.aadd(f"task:{id}", claim, settings.reminder_debounce_seconds)
+        if existing is not None:
+            if claimed:
+                # point the new key at the job that is already queued
+                await reminder_claims.aset(claimed[0], existing, settings.idempotency_key_ttl)
+            logger.info(f"Task reminder for task {id} debounced, reusing job {existing['job_id']}")
+            return _reminder_response(existing["job_id"], task.title, response, duplicate=True)
+        claimed.append(f"task:{id}")
+        if len(claimed) > 1:
+            # now with the title (Redis stored a copy of the claim, not the dict)
+            await reminder_claims.aset(claimed[0], claim, settings.idempotency_key_ttl)
+
         # Dispatch background task to Celery worker
-        celery_task = send_task_reminder.delay(task_id=id, user_id=current_user.id)
-        logger.info(f"Task reminder queued: {celery_task.id} for task {id}")
-        
-        return {
-            "task_id": celery_task.id,
-            "status": "sent_to_queue",
-            "detail": f"Reminder for task '{task.title}' queued for background processing"
-        }
+        # publishing to the broker is blocking network I/O, so it goes to the threadpool
+        with metrics.timed("broker_publish"):
+            await run_in_threadpool(dispatch.send, "send_task_reminder",
+                                    {"task_id": id, "user_id": current_user.id}, task_id=job_id,
+                                    queue=dispatch.INTERACTIVE)
+        logger.info(f"Task reminder queued: {job_id} for task {id}")
+
+        return _reminder_response(job_id, task.title, response, duplicate=False)
+    except HTTPException:
+        # 403/404: nothing was queued, don't keep the claims
+        for key in claimed:
+            await reminder_claims.adelete(key)
+        raise
     except Exception as e:
+        # publish failed: drop the claims so the client's retry can publish
+        for key in claimed:
+            await reminder_claims.adelete(key)
         logger.error(f"Error queueing reminder task: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Could not queue task - background worker may be unavailable"
         )
+
+# SEND REMINDERS FOR MANY TASKS (Background Job)
+# DEVNOTE: one ownership query, then the owned ids are split into chunks of
+# reminder_batch_size and published as a Celery group: one message per chunk
+# instead of one HTTP call + one message + two queries per task.
+
+
+@router.post("/remind", status_code=status.HTTP_202_ACCEPTED, response_model=schemas.BulkRemindResponse,
+             operation_id="send_task_reminders")
+async def send_reminders(payload: schemas.TaskBulkRemind, db: AsyncSession = Depends(get_async_db),
+                         current_user: models.User = Depends(oauth2.get_current_user)):
+    if len(payload.task_ids) > settings.reminder_max_tasks:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                            detail=f"At most {settings.reminder_max_tasks} tasks per reminder request")
+
+    owners = await crud.task_owners(db, payload.task_ids)
+
+    results, owned = [], []
+    for task_id in dict.fromkeys(payload.task_ids):  # de-duplicated, order kept
+        result = _ownership_result(task_id, owners, current_user)
+        if result is None:
+            owned.append(task_id)
+            result = schemas.BulkItemResult(id=task_id, status="queued")
+        results.append(result)
+
+    if not owned:
+        return {"status": "nothing_to_send", "job_ids": [], "queued": 0, "results": results}
+
+    size = settings.reminder_batch_size
+    chunks = [owned[i:i + size] for i in range(0, len(owned), size)]
+    try:
+        # publishing to the broker is blocking network I/O, so it goes to the threadpool
+        with metrics.timed("broker_publish"):
+            group_result = await run_in_threadpool(
+                dispatch.send_group, "send_task_reminders_batch",
+                [{"task_ids": chunk, "user_id": current_user.id} for chunk in chunks],
+                queue=dispatch.INTERACTIVE)
+    except Exception as e:
+        logger.error(f"Error queueing reminder batch: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not queue task - background worker may be unavailable"
+        )
+
+    logger.info(f"Reminder batch queued: {len(owned)} tasks in {len(chunks)} messages "
+                f"(group {group_result.id}) for user {current_user.id}")
+    return {
+        "status": "sent_to_queue",
+        "group_id": group_result.id,
+        "job_ids": [child.id for child in group_result.children],
+        "queued": len(owned),
+        "results": results,
+    }
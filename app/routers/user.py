@@ -1,11 +1,11 @@
 # app/routers/user.py
 
 from fastapi import Depends, HTTPException, status, APIRouter
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError # Import this
 
 from .. import models, schemas, utils
-from ..database import get_db
+from ..database import get_async_db, pin_to_primary
 
 router = APIRouter(
     prefix="/users",
@@ -13,8 +13,9 @@ router = APIRouter(
 )
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.UserResponse)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    hashed_password = utils.hash(user.password)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    # Argon2 runs on the dedicated hashing pool (utils), not on the event loop.
+    hashed_password = await utils.hash_async(user.password)
     user.password = hashed_password
     
     new_user = models.User(**user.dict())
@@ -22,11 +23,13 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db.add(new_user)
     
     try:
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
     except IntegrityError: # Catch the specific database error
-        db.rollback() # Rollback the failed transaction
+        await db.rollback() # Rollback the failed transaction
         raise HTTPException(status_code=status.HTTP_409_CONFLICT,
                             detail=f"User with email: {user.email} already exists")
-    
-    return new_user
\ No newline at end of file
+
+    # the new row may not be on the replicas yet, and the next request looks it up there
+    await pin_to_primary(new_user.id)
+    return new_user
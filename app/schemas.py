@@ -8,8 +8,9 @@
 
 # app/schemas.py
 
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from datetime import datetime
+from typing import Any, List, Optional
 
 # DOCS_MENTIONED: "This is a base model. We use it to share common attributes
 # between other schemas to avoid repetition (DRY principle)."
@@ -22,6 +23,7 @@ class TaskBase(BaseModel):
     title: str
     content: str
     completed: bool = False  # Provide a default value
+    due_date: Optional[datetime] = None
 
 # This schema is used when a user sends data to create a task.
 # It inherits all fields from TaskBase.
@@ -47,6 +49,101 @@ class TaskResponse(TaskBase):
     class Config:
         from_attributes = True  # Formerly orm_mode = True
 
+# One page of tasks for GET /tasks/.
+# next_cursor is None on the last page, otherwise pass it back as ?cursor=...
+
+
+class TaskPage(BaseModel):
+    items: List[TaskResponse]
+    next_cursor: Optional[str] = None
+
+# GET /tasks/stats, served from the task_stats counters.
+
+
+class TaskStatsResponse(BaseModel):
+    total: int
+    completed: int
+    incomplete: int
+
+# GET /tasks/search: best matches first. rank is only comparable within one search.
+# next_offset is None once the page is short or the top-k limit is reached.
+
+
+class TaskSearchResult(TaskResponse):
+    rank: float
+
+
+class TaskSearchPage(BaseModel):
+    items: List[TaskSearchResult]
+    next_offset: Optional[int] = None
+
+# BULK TASK SCHEMAS
+# pattern is list in -> one result per item out (same order as the request)
+
+# Bulk update item: the id plus only the fields you want to change.
+
+
+class TaskBulkUpdate(BaseModel):
+    id: int
+    title: Optional[str] = None
+    content: Optional[str] = None
+    completed: Optional[bool] = None
+    due_date: Optional[datetime] = None
+
+    # fields left out stay as they are; "due_date": null clears the deadline (like PUT),
+    # the NOT NULL columns can't be set to null
+    @field_validator("title", "content", "completed")
+    @classmethod
+    def _not_null(cls, value):
+        if value is None:
+            raise ValueError("can be left out but not null")
+        return value
+
+
+class TaskBulkDelete(BaseModel):
+    ids: List[int]
+
+# status is one of: created, updated, unchanged, deleted, not_found, forbidden
+
+
+class BulkItemResult(BaseModel):
+    id: Optional[int] = None
+    status: str
+    task: Optional[TaskResponse] = None
+
+
+class BulkResult(BaseModel):
+    results: List[BulkItemResult]
+
+# BULK REMINDER SCHEMAS
+
+
+class TaskBulkRemind(BaseModel):
+    task_ids: List[int]
+
+
+class BulkRemindResponse(BaseModel):
+    status: str
+    group_id: Optional[str] = None
+    job_ids: List[str]
+    queued: int
+    results: List[BulkItemResult]
+
+# JOB STATUS SCHEMA
+# state is one of: QUEUED, STARTED, RETRY, SUCCESS, FAILURE
+
+
+class JobStatus(BaseModel):
+    id: str
+    name: Optional[str] = None
+    state: str
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    queued_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime
+
 # USER SCHEMAS
 
 
@@ -0,0 +1,275 @@
+# --------------------------------
+# purpose: run the API on every core: one pre-forked uvicorn server per worker process.
+# target: Cloud Task Manager API
+# --------------------------------
+
+# app/serve.py
+
+"""
+Multi-process launcher for the API.
+
+Usage:
+    python -m app.serve                         # SERVE_WORKERS workers (0 = one per CPU)
+    python -m app.serve --workers 4 --port 8000
+
+Signals (to the master process):
+    SIGTERM / SIGINT   graceful stop: workers finish in-flight requests, then exit
+    SIGHUP             rolling restart: each worker is replaced by a fresh one, one at a time
+
+Run `python -m app.bootstrap` first, this does not create tables.
+"""
+
+# DEVNOTE: how it works
+#   - the master imports app.main ONCE ("preload"), binds the listening socket, then
+#     fork()s the workers: they start in milliseconds and share the imported code pages
+#   - every worker runs its own uvicorn Server (its own event loop) on the shared socket,
+#     the kernel spreads new connections between them
+#   - uvloop + httptools are used when installed (uvicorn[standard] installs both)
+#   - every worker resizes its DB pools so all workers together stay within
+#     serve_db_connection_budget (Postgres max_connections is per server, not per worker)
+#   - a worker that dies is replaced; SIGHUP replaces them all, each new worker has to be
+#     serving before the old one is told to stop, so capacity never drops to zero
+# Preloading means a SIGHUP restart runs the SAME code: deploy new code by restarting
+# the master (the container), like gunicorn --preload.
+
+import argparse
+import importlib.util
+import logging
+import os
+import select
+import shutil
+import signal
+import sys
+import tempfile
+import time
+
+import uvicorn
+
+from .config import settings
+
+logger = logging.getLogger("app.serve")
+
+# a worker that hasn't started serving after this many seconds is killed and replaced
+STARTUP_TIMEOUT = 60
+# don't respawn a crashing worker in a tight loop
+RESPAWN_DELAY = 1.0
+
+
+def worker_count(requested: int = 0) -> int:
+    return requested or settings.serve_workers or os.cpu_count() or 1
+
+
+def pool_share(workers: int, budget: int = None):
+    """(pool_size, max_overflow) for one worker, so `workers` of them fit in `budget`."""
+    budget = settings.serve_db_connection_budget if budget is None else budget
+    share = max(budget // workers, 1)
+    configured = settings.db_pool_size + settings.db_max_overflow
+    pool_size = max(1, round(share * settings.db_pool_size / configured)) if configured else share
+    pool_size = min(pool_size, share)
+    return pool_size, share - pool_size
+
+
+def event_loop_and_parser():
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    return loop, http
+
+
+class _Server(uvicorn.Server):
+    """uvicorn.Server that tells the master when it is accepting connections."""
+
+    def __init__(self, config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets)
+        if not self.should_exit:
+            os.write(self.ready_fd, b"1")
+        os.close(self.ready_fd)
+
+
+class Master:
+    def __init__(self, config: uvicorn.Config, workers: int):
+        self.config = config
+        self.workers = workers
+        self.socket = config.bind_socket()
+        self.children = {}  # pid -> ready pipe (read end, None once ready)
+        self.stopping = False
+        self.restart_requested = False
+
+    # ---- worker side ----
+
+    def _run_worker(self, ready_fd: int):
+        from . import database
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, signal.SIG_DFL)
+        # Ctrl+C goes to the whole process group: the master decides, workers wait for SIGTERM
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        pool_size, max_overflow = pool_share(self.workers)
+        database.configure_engine(pool_size=pool_size, max_overflow=max_overflow, inherited=True)
+
+        server = _Server(self.config, ready_fd)
+        server.run(sockets=[self.socket])
+        # skip the master's atexit handlers and buffered output, they aren't ours
+        os._exit(0 if server.started else 3)
+
+    # ---- master side ----
+
+    def spawn(self) -> int:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                self._run_worker(write_fd)
+            except BaseException:
+                logger.exception("Worker crashed")
+            os._exit(1)
+        os.close(write_fd)
+        self.children[pid] = read_fd
+        logger.info(f"Started worker {pid}")
+        return pid
+
+    def wait_ready(self, pid: int, timeout: float = STARTUP_TIMEOUT) -> bool:
+        read_fd = self.children.get(pid)
+        if read_fd is None:
+            return pid in self.children
+        ready, _, _ = select.select([read_fd], [], [], timeout)
+        ok = bool(ready) and os.read(read_fd, 1) == b"1"
+        os.close(read_fd)
+        if pid in self.children:
+            self.children[pid] = None
+        return ok
+
+    def stop_worker(self, pid: int, timeout: float):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._reap(pid):
+                return
+            time.sleep(0.05)
+        logger.warning(f"Worker {pid} did not stop in {timeout}s, killing it")
+        os.kill(pid, signal.SIGKILL)
+        self._reap(pid, block=True)
+
+    def _reap(self, pid: int = -1, block: bool = False):
+        """Collect exited workers. Returns (pid, exit code) for each, negative = killed by signal."""
+        exited = []
+        while self.children:
+            try:
+                done, status = os.waitpid(pid, 0 if block else os.WNOHANG)
+            except ChildProcessError:
+                break
+            if done == 0:
+                break
+            read_fd = self.children.pop(done, None)
+            if read_fd is not None:
+                os.close(read_fd)
+            _forget_metrics(done)
+            exited.append((done, os.waitstatus_to_exitcode(status)))
+            if pid != -1:
+                break
+        return exited
+
+    def rolling_restart(self):
+        logger.info("Rolling restart")
+        for old in list(self.children):
+            new = self.spawn()
+            if not self.wait_ready(new):
+                logger.error(f"Replacement worker {new} did not start, keeping worker {old}")
+                self.stop_worker(new, timeout=5)
+                continue
+            self.stop_worker(old, timeout=settings.serve_graceful_timeout + 5)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_restart)
+
+        for pid in [self.spawn() for _ in range(self.workers)]:
+            self.wait_ready(pid)
+        logger.info(f"Serving on {self.config.host}:{self.config.port} with {self.workers} workers")
+
+        while not self.stopping:
+            if self.restart_requested:
+                self.restart_requested = False
+                self.rolling_restart()
+            for pid, code in self._reap():
+                if not self.stopping:
+                    logger.warning(f"Worker {pid} exited with {code}, starting a new one")
+                    time.sleep(RESPAWN_DELAY)
+                    self.spawn()
+            time.sleep(0.2)  # signals interrupt the sleep
+
+        logger.info("Stopping workers")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + settings.serve_graceful_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in list(self.children):
+            logger.warning(f"Worker {pid} did not stop in time, killing it")
+            os.kill(pid, signal.SIGKILL)
+            self._reap(pid, block=True)
+        self.socket.close()
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def _on_restart(self, signum, frame):
+        self.restart_requested = True
+
+
+def _forget_metrics(pid: int):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=0, help="default: SERVE_WORKERS, 0 = one per CPU")
+    parser.add_argument("--no-access-log", action="store_true", help="skip the per-request log line")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    workers = worker_count(args.workers)
+
+    # /metrics has to add up every worker. prometheus_client picks its storage on import,
+    # so this must happen before app.main (and app.metrics) is imported.
+    metrics_dir = None
+    if workers > 1 and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="task-api-metrics-")
+
+    loop, http = event_loop_and_parser()
+    from .main import app  # preload, once, before forking
+    config = uvicorn.Config(app, host=args.host, port=args.port, loop=loop, http=http,
+                            lifespan="on", access_log=not args.no_access_log,
+                            timeout_graceful_shutdown=settings.serve_graceful_timeout)
+
+    pool_size, max_overflow = pool_share(workers)
+    logger.info(f"{workers} workers, loop={loop}, http={http}, "
+                f"DB pool per worker: {pool_size} + {max_overflow} overflow "
+                f"(budget {settings.serve_db_connection_budget})")
+    try:
+        Master(config, workers).run()
+    finally:
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,19 +10,29 @@ Demonstrates:
 """
 
 import logging
-from celery import shared_task
-from datetime import datetime, timedelta
+import os
+from celery import group, shared_task
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, case, func, or_
 from sqlalchemy.orm import Session
 
+from . import crud, events
 from .database import SessionLocal
-from .models import Task, User
+from .models import ScanCheckpoint, Task, TaskStats, User
 
 # Configure logging for tasks
 logger = logging.getLogger(__name__)
 
+# Newly overdue tasks above this are split into id ranges of this size across workers.
+OVERDUE_SCAN_CHUNK_SIZE = int(os.getenv("OVERDUE_SCAN_CHUNK_SIZE", "5000"))
+
+# Users per transaction when reconcile_task_stats recounts task_stats.
+STATS_RECONCILE_BATCH_SIZE = int(os.getenv("STATS_RECONCILE_BATCH_SIZE", "500"))
+
 
 @shared_task(
     bind=True,
+    ignore_result=True,  # status lives in the job store (app/jobs.py)
     max_retries=3,
     default_retry_delay=60,  # Retry after 60 seconds first
     autoretry_for=(Exception,),
@@ -67,40 +77,133 @@ def send_task_reminder(self, task_id: int, user_id: int):
                 f"Task {task_id} already completed; no reminder needed")
             return {"status": "already_completed", "task_id": task_id}
 
-        # Simulate sending a reminder email (in production, use actual email service)
-        logger.info(
-            f"Sending reminder for task '{task.title}' to user {user.email} "
-            f"(Task ID: {task_id}, Owner: {user_id})"
-        )
-
-        # In a real system, you'd call an email service here:
-        # send_email(
-        #     to=user.email,
-        #     subject=f"Reminder: {task.title}",
-        #     body=f"You have an incomplete task: {task.content}"
-        # )
+        result = _deliver_reminder(task, user)
+        events.publish_quietly(user.id, [_reminder_event(task.id, self.request.id)])
+        return result
+
+    except Exception as exc:
+        logger.error(f"Error sending reminder for task {task_id}: {str(exc)}")
+
+        # Retry with exponential backoff
+        # max_retries=3 ensures we don't retry forever
+        raise self.retry(exc=exc)
+
+    finally:
+        db.close()
+
+
+# change feed (GET /tasks/events) entry for a delivered reminder
+def _reminder_event(task_id: int, job_id: str):
+    return "reminder.completed", {"task_id": task_id, "job_id": job_id}
+
+
+def _deliver_reminder(task: Task, user: User):
+    # Simulate sending a reminder email (in production, use actual email service)
+    logger.info(
+        f"Sending reminder for task '{task.title}' to user {user.email} "
+        f"(Task ID: {task.id}, Owner: {user.id})"
+    )
+
+    # In a real system, you'd call an email service here:
+    # send_email(
+    #     to=user.email,
+    #     subject=f"Reminder: {task.title}",
+    #     body=f"You have an incomplete task: {task.content}"
+    # )
+
+    return {
+        "status": "success",
+        "task_id": task.id,
+        "user": user.email,
+        "task": task.title,
+        "sent_at": datetime.utcnow().isoformat(),
+    }
+
+
+@shared_task(
+    bind=True,
+    ignore_result=True,  # status lives in the job store (app/jobs.py)
+    max_retries=3,
+    default_retry_delay=60,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_backoff_max=600,
+    retry_jitter=True,
+)
+def send_task_reminders_batch(self, task_ids: list, user_id: int):
+    """
+    Send reminders for a batch of tasks owned by one user.
+
+    Same guarantees as send_task_reminder, but the whole batch is loaded in ONE query
+    (tasks joined with their owner) instead of two queries per task.
+
+    Args:
+        task_ids: IDs of the tasks to remind about (one chunk from POST /tasks/remind)
+        user_id: ID of the user who owns the tasks
+    """
+    db = SessionLocal()
+
+    try:
+        rows = (db.query(Task, User)
+                .join(User, Task.owner_id == User.id)
+                .filter(Task.id.in_(task_ids), Task.owner_id == user_id)
+                .all())
+
+        summary = {"sent": 0, "already_completed": 0, "not_found": 0}
+        found = set()
+        sent = []
+        for task, user in rows:
+            found.add(task.id)
+            # Idempotency check: don't remind if task is already completed
+            if task.completed:
+                summary["already_completed"] += 1
+                continue
+            _deliver_reminder(task, user)
+            summary["sent"] += 1
+            sent.append(_reminder_event(task.id, self.request.id))
+
+        summary["not_found"] = len(set(task_ids) - found)
+        events.publish_quietly(user_id, sent)
+        logger.info(f"Reminder batch for user {user_id}: {summary}")
 
         return {
             "status": "success",
-            "task_id": task_id,
-            "user": user.email,
-            "task": task.title,
+            "user_id": user_id,
+            **summary,
             "sent_at": datetime.utcnow().isoformat(),
         }
 
     except Exception as exc:
-        logger.error(f"Error sending reminder for task {task_id}: {str(exc)}")
-
-        # Retry with exponential backoff
-        # max_retries=3 ensures we don't retry forever
+        logger.error(f"Error sending reminder batch for user {user_id}: {str(exc)}")
         raise self.retry(exc=exc)
 
     finally:
         db.close()
 
 
+# Name of the checkpoint row (models.ScanCheckpoint) used by the overdue scanner.
+OVERDUE_SCAN = "overdue_tasks"
+
+
+def _newly_overdue_filter(since, until):
+    # incomplete tasks whose deadline passed in (since, until] (ix_tasks_due_date_incomplete),
+    # or that were saved in (since, until] with a deadline already passed: created or edited
+    # with a past due_date, which the deadline window alone never sees again
+    # (ix_tasks_updated_at_incomplete). A task that is edited while it is overdue counts again.
+    incomplete = [Task.completed == False, Task.due_date.isnot(None)]  # both indexes' WHERE
+    if since is None:
+        return [*incomplete, Task.due_date <= until]
+    # DEVNOTE: each OR branch repeats the partial-index WHERE and is a full range on its own
+    # column, so sqlite can search both indexes and union them (MULTI-INDEX OR, a BitmapOr
+    # on postgres). With the shared terms outside the OR it scans every overdue task instead.
+    return [or_(and_(*incomplete, Task.due_date > since, Task.due_date <= until),
+                and_(*incomplete, Task.updated_at > since, Task.updated_at <= until,
+                     Task.due_date <= until))]
+
+
 @shared_task(
     bind=True,
+    ignore_result=True,  # status lives in the job store (app/jobs.py)
     max_retries=2,
     default_retry_delay=30,
     autoretry_for=(Exception,),
@@ -108,7 +211,7 @@ def send_task_reminder(self, task_id: int, user_id: int):
 )
 def mark_overdue_tasks(self):
     """
-    Scheduled task to identify and log overdue tasks.
+    Scheduled task (Celery Beat) to find tasks that became overdue since the last run.
 
     In a production system, this could:
     - Send batch reminders
@@ -117,29 +220,58 @@ def mark_overdue_tasks(self):
     - Archive old completed tasks
 
     Features:
-    - Runs periodically via Celery Beat
-    - Fault-tolerant with retries
-    - Includes metrics for monitoring
+    - Incremental: keeps a high-water mark in scan_checkpoints, only looks at tasks
+      that became due after it (never the whole table)
+    - Counts with SQL aggregates, rows are never loaded into worker memory
+    - Large backlogs are split into id-range chunks of up to OVERDUE_SCAN_CHUNK_SIZE
+      matching tasks each, fanned out to other workers
+    - Fault-tolerant with retries (the mark only moves once the run succeeded; chunks
+      are published after it is saved, so a retry never queues them twice)
     """
     db = SessionLocal()
 
     try:
-        # Find incomplete tasks (in practice, you'd add a 'due_date' field to Task model)
-        incomplete_tasks = db.query(Task).filter(Task.completed == False).all()
-
-        logger.info(f"Found {len(incomplete_tasks)} incomplete tasks")
-
-        # Example: log task details for monitoring
-        for task in incomplete_tasks[:5]:  # Log first 5
-            logger.debug(
-                f"Incomplete task: {task.title} (ID: {task.id}, "
-                f"Created: {task.created_at}, Owner: {task.owner_id})"
-            )
+        now = datetime.now(timezone.utc)
+
+        # FOR UPDATE: two overlapping runs can't scan the same window twice (no-op on sqlite)
+        checkpoint = db.query(ScanCheckpoint).filter(
+            ScanCheckpoint.name == OVERDUE_SCAN).with_for_update().first()
+        since = checkpoint.high_water if checkpoint else None
+
+        count, min_id, max_id = db.query(
+            func.count(Task.id), func.min(Task.id), func.max(Task.id)
+        ).filter(*_newly_overdue_filter(since, now)).one()
+
+        ranges = []
+        if count > OVERDUE_SCAN_CHUNK_SIZE:
+            # fan out id ranges; each worker aggregates only its own slice
+            ranges = _overdue_chunks(db, since, now, max_id)
+        elif count:
+            _summarize_overdue_range(db, min_id, max_id, since, now)
+
+        if checkpoint is None:
+            db.add(ScanCheckpoint(name=OVERDUE_SCAN, high_water=now))
+        else:
+            checkpoint.high_water = now
+        db.commit()
+
+        # DEVNOTE: publish only once the mark is saved. Publishing first, a failed commit
+        # (or a worker dying in between) meant the retry scanned the same window and queued
+        # every range again. The other way round a failed publish loses this window's
+        # chunks (the retry starts at the new mark): at most once instead of twice.
+        chunks = len(ranges)
+        if ranges:
+            window = (since.isoformat() if since else None, now.isoformat())
+            group(process_overdue_range.s(low, high, *window) for low, high in ranges).apply_async()
+
+        logger.info(f"Found {count} newly overdue tasks since {since} ({chunks} chunks fanned out)")
 
         return {
             "status": "success",
-            "incomplete_task_count": len(incomplete_tasks),
-            "checked_at": datetime.utcnow().isoformat(),
+            "newly_overdue_count": count,
+            "chunks": chunks,
+            "since": since.isoformat() if since else None,
+            "checked_at": now.isoformat(),
         }
 
     except Exception as exc:
@@ -150,7 +282,129 @@ def mark_overdue_tasks(self):
         db.close()
 
 
-@shared_task(bind=True, max_retries=1)
+def _overdue_chunks(db: Session, since, until, max_id: int):
+    # DEVNOTE: keyset chunks over the matching ids, not fixed id spans: every
+    # OVERDUE_SCAN_CHUNK_SIZE-th of them starts a range, so each message covers up to that
+    # many real rows. Fixed spans over min_id..max_id sent one message per mostly empty span
+    # when a few overdue tasks sat far apart in the id space.
+    numbered = db.query(
+        Task.id.label("id"), func.row_number().over(order_by=Task.id).label("n")
+    ).filter(*_newly_overdue_filter(since, until)).subquery()
+    starts = [low for (low,) in db.query(numbered.c.id).filter(
+        (numbered.c.n - 1) % OVERDUE_SCAN_CHUNK_SIZE == 0).order_by(numbered.c.id)]
+    return [(low, next_low - 1) for low, next_low in zip(starts, starts[1:])] + [(starts[-1], max_id)]
+
+
+def _summarize_overdue_range(db: Session, low_id: int, high_id: int, since, until):
+    # one GROUP BY per range: overdue count per owner, no rows materialized
+    per_owner = db.query(Task.owner_id, func.count(Task.id)).filter(
+        Task.id.between(low_id, high_id), *_newly_overdue_filter(since, until)
+    ).group_by(Task.owner_id).all()
+
+    for owner_id, overdue in per_owner:
+        logger.debug(f"Owner {owner_id} has {overdue} newly overdue tasks (ids {low_id}-{high_id})")
+
+    return {"owners": len(per_owner), "overdue": sum(overdue for _, overdue in per_owner)}
+
+
+@shared_task(
+    bind=True,
+    ignore_result=True,  # status lives in the job store (app/jobs.py)
+    max_retries=2,
+    default_retry_delay=30,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+)
+def process_overdue_range(self, low_id: int, high_id: int, since: str, until: str):
+    """One id-range chunk of a large overdue scan (see mark_overdue_tasks)."""
+    db = SessionLocal()
+
+    try:
+        since_dt = datetime.fromisoformat(since) if since else None
+        summary = _summarize_overdue_range(db, low_id, high_id, since_dt, datetime.fromisoformat(until))
+        logger.info(f"Overdue chunk {low_id}-{high_id}: {summary}")
+        return {"status": "success", "low_id": low_id, "high_id": high_id, **summary}
+
+    except Exception as exc:
+        logger.error(f"Error in process_overdue_range {low_id}-{high_id}: {str(exc)}")
+        raise self.retry(exc=exc)
+
+    finally:
+        db.close()
+
+
+@shared_task(
+    bind=True,
+    ignore_result=True,  # status lives in the job store (app/jobs.py)
+    max_retries=2,
+    default_retry_delay=60,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+)
+def reconcile_task_stats(self):
+    """
+    Scheduled task (Celery Beat) that recounts task_stats and repairs drift.
+
+    The API keeps the counters exact, so this normally changes nothing. It catches
+    rows changed outside the API (psql, scripts) and fills counters for users that
+    had tasks before the table existed.
+
+    Features:
+    - Users in batches of STATS_RECONCILE_BATCH_SIZE, one short transaction each
+    - One GROUP BY per batch on the (owner_id, id) index, no task rows loaded
+    - Only counters that differ are written
+    """
+    db = SessionLocal()
+
+    try:
+        dialect_name = db.get_bind().dialect.name
+        checked = repaired = 0
+        after_id = 0
+
+        while True:
+            user_ids = [user_id for (user_id,) in db.query(User.id).filter(
+                User.id > after_id).order_by(User.id).limit(STATS_RECONCILE_BATCH_SIZE)]
+            if not user_ids:
+                break
+            after_id = user_ids[-1]
+
+            # DEVNOTE: lock the counters before counting. A write that is in flight then
+            # waits for us and adds its delta on top of what we store, instead of us
+            # overwriting its delta with a count that didn't include it.
+            stored = {stats.user_id: (stats.total, stats.completed) for stats in db.query(
+                TaskStats).filter(TaskStats.user_id.in_(user_ids)).with_for_update()}
+
+            counted = {owner_id: (total, int(completed or 0)) for owner_id, total, completed in db.query(
+                Task.owner_id, func.count(Task.id), func.sum(case((Task.completed == True, 1), else_=0))
+            ).filter(Task.owner_id.in_(user_ids)).group_by(Task.owner_id)}
+
+            fixes = []
+            for user_id in user_ids:
+                actual = counted.get(user_id, (0, 0))
+                if stored.get(user_id, (0, 0)) != actual:
+                    logger.warning(f"task_stats drift for user {user_id}: "
+                                   f"stored {stored.get(user_id)}, counted {actual}")
+                    fixes.append({"user_id": user_id, "total": actual[0], "completed": actual[1]})
+
+            if fixes:
+                db.execute(crud.stats_upsert(dialect_name, fixes, increment=False))
+            db.commit()
+
+            checked += len(user_ids)
+            repaired += len(fixes)
+
+        logger.info(f"Reconciled task_stats: {checked} users checked, {repaired} repaired")
+        return {"status": "success", "checked": checked, "repaired": repaired}
+
+    except Exception as exc:
+        logger.error(f"Error in reconcile_task_stats: {str(exc)}")
+        raise self.retry(exc=exc)
+
+    finally:
+        db.close()
+
+
+@shared_task(bind=True, max_retries=1, ignore_result=True)
 def sync_task_metadata(self, task_id: int):
     """
     Example task for keeping task metadata in sync with external systems.
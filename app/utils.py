@@ -6,11 +6,32 @@
 
 # app/utils.py
 
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
 # simply import CryptContext from passlib.context
 from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics
+from .config import settings
 
 # Tell passlib to use 'argon2' as the default scheme. This bypasses bcrypt completely.
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# DEVNOTE: cost parameters come from settings. passlib's needs_update flags a stored hash
+# whose time cost is outside min_rounds..max_rounds (pinned to the setting, so any other
+# value), a different memory cost, or another Argon2 type/version. It never looks at
+# parallelism, verify_and_update checks that one itself.
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=settings.argon2_time_cost,
+    argon2__min_rounds=settings.argon2_time_cost,
+    argon2__max_rounds=settings.argon2_time_cost,
+    argon2__memory_cost=settings.argon2_memory_cost,
+    argon2__parallelism=settings.argon2_parallelism,
+)
 
 # function to hash a password
 # pattern is hash function -> use pwd_context to hash -> return hashed password
@@ -26,3 +47,77 @@ def hash(password: str):
 
 def verify(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
+
+# same as verify, but also returns a new hash when the stored one uses outdated parameters
+# pattern is (is_valid, new_hash_or_None)
+
+
+def verify_and_update(plain_password, hashed_password):
+    valid, new_hash = pwd_context.verify_and_update(plain_password, hashed_password)
+    if valid and new_hash is None \
+            and pwd_context.handler().from_string(hashed_password).parallelism != settings.argon2_parallelism:
+        new_hash = hash(plain_password)
+    return valid, new_hash
+
+
+# ---------------------------------
+# DEDICATED HASHING POOL
+# ---------------------------------
+
+# DEVNOTE: Argon2 is tens of ms of CPU + memory per call. On the shared threadpool a burst
+# of logins starves normal requests, so hashing runs in its own small process pool.
+# The number of jobs (running + waiting) is capped; past that we fail fast with 503
+# instead of letting logins queue up behind each other.
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool is full. main.py turns it into a 503 with Retry-After."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, not fork: the API process has an event loop and threads running
+            _executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def _run_hashing(fn, *args):
+    global _in_flight
+    limit = max(settings.password_hash_workers, 1) + settings.password_hash_queue_size
+    with _in_flight_lock:
+        if _in_flight >= limit:
+            raise PasswordHasherBusy()
+        _in_flight += 1
+    try:
+        if settings.password_hash_workers <= 0:
+            return await run_in_threadpool(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        with _in_flight_lock:
+            _in_flight -= 1
+
+
+async def hash_async(password: str):
+    with metrics.timed("password_hash"):
+        return await _run_hashing(hash, password)
+
+
+async def verify_and_update_async(plain_password, hashed_password):
+    with metrics.timed("password_verify"):
+        return await _run_hashing(verify_and_update, plain_password, hashed_password)
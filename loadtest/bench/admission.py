@@ -0,0 +1,129 @@
+# loadtest/bench/admission.py
+"""
+Overload with and without the in-flight cap (app/admission.py).
+
+Starts `python -m app.serve` once per --max-in-flight value (0 = no cap) and sends it
+far more concurrent GET /tasks/?limit=50 requests than it can serve (--clients
+processes x --connections each). Reported per run:
+
+  - ok:       latency percentiles + throughput of the requests that were served
+  - ok_server_ms: the same requests' time inside the server (Server-Timing `app`), without
+              the client side: on a small host the load generators compete for the CPU
+  - rejected: how many got 503, and how fast (a rejection should cost ~nothing)
+
+Without the cap every request is admitted: requests holding a DB connection wait for a
+threadpool thread while the threads wait for a connection, so latency grows with the
+number of clients until requests fail with pool timeouts. With it the extra requests
+get an immediate 503 and the served ones keep a short queue. A rejected client waits
+--backoff seconds before its next request, like a client honouring Retry-After.
+
+Rate limits are off here (loadtest.bench.common), one user sends everything.
+
+Usage:
+    python -m loadtest.bench.admission --max-in-flight 0 32 8 --connections 200 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import time
+
+from . import common, serve_throughput
+
+_APP_TIMING = re.compile(r"app;dur=([0-9.]+)")
+
+
+async def _client(url, headers, connections, duration, backoff):
+    import httpx
+    served, server, rejected, errors = [], [], [], 0
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        stop_at = time.perf_counter() + duration
+
+        async def loop():
+            nonlocal errors
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                try:
+                    res = await client.get(url, headers=headers)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                elapsed = time.perf_counter() - start
+                if res.status_code in (429, 503):
+                    rejected.append(elapsed)
+                    await asyncio.sleep(backoff)
+                elif res.status_code < 400:
+                    served.append(elapsed)
+                    timing = _APP_TIMING.search(res.headers.get("server-timing", ""))
+                    if timing:
+                        server.append(float(timing.group(1)) / 1000)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(loop() for _ in range(connections)))
+    return served, server, rejected, errors
+
+
+def _client_process(url, headers, connections, duration, backoff, queue):
+    queue.put(asyncio.run(_client(url, headers, connections, duration, backoff)))
+
+
+def overload(url, headers, clients, connections, duration, backoff):
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_client_process,
+                                         args=(url, headers, connections, duration, backoff, queue))
+                 for _ in range(clients)]
+    with common.Timer() as timer:
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+    served = [value for result in results for value in result[0]]
+    server = [value for result in results for value in result[1]]
+    rejected = [value for result in results for value in result[2]]
+    return {"ok": common.summarize(served, timer.elapsed),
+            "ok_server_ms": {"p50": round(common.percentile(server, 50) * 1000, 2),
+                             "p95": round(common.percentile(server, 95) * 1000, 2)},
+            "rejected": {"count": len(rejected),
+                         "p95_ms": round(common.percentile(rejected, 95) * 1000, 2)},
+            "errors": sum(result[3] for result in results)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-in-flight", type=int, nargs="+", default=[0, 32],
+                        help="ADMISSION_MAX_IN_FLIGHT values to compare, 0 = no cap")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=1, help="load generator processes")
+    parser.add_argument("--connections", type=int, default=200, help="requests in flight per client")
+    parser.add_argument("--backoff", type=float, default=0.5, help="seconds a rejected client waits")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    db_path = common.configure_env()
+    common.reset_database(db_path)
+    headers = {"Authorization": f"Bearer {serve_throughput.seed(args.tasks)}"}
+    url = f"http://127.0.0.1:{args.port}{serve_throughput.ROUTES['GET /tasks/']}"
+
+    results = []
+    for cap in args.max_in_flight:
+        os.environ["ADMISSION_MAX_IN_FLIGHT"] = str(cap)
+        process = serve_throughput.start_server(args.workers, args.port)
+        try:
+            results.append({"max_in_flight": cap,
+                            **overload(url, headers, args.clients, args.connections, args.duration, args.backoff)})
+        finally:
+            serve_throughput.stop_server(process)
+    print(json.dumps({"workers": args.workers, "concurrency": args.clients * args.connections,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# loadtest/bench/cold_start.py
+"""
+Cold start of the API: how long until a fresh process can answer its first request.
+
+Every run is a new Python process (nothing cached in sys.modules), measuring:
+
+  - import_ms:          `import app.main`
+  - first_response_ms:  import + lifespan startup + first GET /health over ASGI
+  - first_dispatch_ms:  the first Celery publish (imports Celery lazily, memory broker)
+  - celery_imported:    whether `import app.main` pulled in Celery (it shouldn't)
+  - routes:             number of routes, and whether any is registered twice
+
+The schema is created once up front with app.bootstrap, like the compose service does.
+Reported numbers are medians over --runs processes.
+
+Usage:
+    python -m loadtest.bench.cold_start --runs 5
+    python -m loadtest.bench.cold_start --importtime 15   # slowest imports (-X importtime)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from . import common
+
+# runs in the child process; prints one JSON line
+PROBE = r"""
+import asyncio, json, sys, time
+
+start = time.perf_counter()
+import app.main
+import_done = time.perf_counter()
+celery_imported = "celery" in sys.modules
+
+from loadtest.bench import common
+
+async def first_response():
+    lifespan = app.main.app.router.lifespan_context(app.main.app)
+    await lifespan.__aenter__()
+    try:
+        async with common.asgi_client(app.main.app) as client:
+            res = await client.get("/health")
+            res.raise_for_status()
+    finally:
+        await lifespan.__aexit__(None, None, None)
+
+asyncio.run(first_response())
+response_done = time.perf_counter()
+
+from app import dispatch
+dispatch_start = time.perf_counter()
+dispatch.send("reconcile_task_stats", {})
+dispatch_done = time.perf_counter()
+
+def flatten(routes, prefix=""):
+    # newer FastAPI keeps included routers as one entry each: walk into them
+    for route in routes:
+        included = getattr(route, "original_router", None)
+        if included is not None:
+            yield from flatten(included.routes, prefix + route.include_context.prefix)
+        else:
+            yield prefix + route.path, tuple(sorted(getattr(route, "methods", None) or ()))
+
+paths = list(flatten(app.main.app.routes))
+print(json.dumps({
+    "import_ms": (import_done - start) * 1000,
+    "first_response_ms": (response_done - start) * 1000,
+    "first_dispatch_ms": (dispatch_done - dispatch_start) * 1000,
+    "celery_imported": celery_imported,
+    "routes": len(paths),
+    "duplicate_routes": len(paths) - len(set(paths)),
+}))
+"""
+
+
+def _child_env():
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    return env
+
+
+def probe_once():
+    out = subprocess.run([sys.executable, "-c", PROBE], env=_child_env(),
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def slowest_imports(top):
+    """The `top` slowest modules (cumulative µs) from python -X importtime."""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], env=_child_env(),
+                         capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), name))
+    # nested modules are indented: keep the names, the cumulative time already includes children
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)}
+            for us, name in sorted(rows, reverse=True)[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="also list the N slowest imports of app.main")
+    args = parser.parse_args()
+
+    db_path = common.configure_env()
+    common.reset_database(db_path)
+
+    runs = [probe_once() for _ in range(args.runs)]
+    result = {"runs": args.runs}
+    for key in ("import_ms", "first_response_ms", "first_dispatch_ms"):
+        result[key] = round(statistics.median(run[key] for run in runs), 1)
+    # these don't vary between runs
+    for key in ("celery_imported", "routes", "duplicate_routes"):
+        result[key] = runs[-1][key]
+    if args.importtime:
+        result["slowest_imports"] = slowest_imports(args.importtime)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# loadtest/bench/common.py
+"""
+Shared helpers for the in-process Python benchmarks.
+
+Import this module BEFORE anything from `app`: it points the settings at a throwaway
+sqlite database and an in-memory Celery broker, so no Postgres/RabbitMQ is needed.
+"""
+
+import os
+import statistics
+import tempfile
+import time
+
+
+def configure_env(db_path=None, **overrides):
+    """Set the env vars the app reads at import time. Explicit overrides win over the shell."""
+    db_path = db_path or os.path.join(tempfile.gettempdir(), "task-manager-bench.db")
+    defaults = {
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "SECRET_KEY": "bench-secret-key-not-for-production",
+        "ALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        # one client hammering a few users: limits high enough never to trigger, so the
+        # routes are measured (the buckets are still checked on every request)
+        "RATE_LIMIT_USER": "1000000/1",
+        "RATE_LIMIT_LOGIN": "1000000/1",
+        "RATE_LIMIT_SIGNUP": "1000000/1",
+        "RATE_LIMIT_REMIND": "1000000/1",
+        # the suite sends --concurrency exports at once, more than the default export cap
+        "ADMISSION_MAX_EXPORTS": "0",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+    for key, value in overrides.items():
+        os.environ[key.upper()] = str(value)
+    return db_path
+
+
+def reset_database(db_path):
+    """Drop the sqlite file and create the schema, like `python -m app.bootstrap`."""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    from app import bootstrap
+    bootstrap.create_schema()
+
+
+def asgi_client(app):
+    """An httpx client that calls the ASGI app directly, no sockets involved."""
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+async def signup_and_login(client, email, password="bench-password"):
+    await client.post("/users/", json={"email": email, "password": password})
+    res = await client.post("/login", data={"username": email, "password": password})
+    res.raise_for_status()
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    """Latency percentiles in ms plus throughput for a list of per-request seconds."""
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
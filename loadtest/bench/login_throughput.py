@@ -0,0 +1,101 @@
+# loadtest/bench/login_throughput.py
+"""
+Login throughput next to concurrent GET /tasks/ reads.
+
+Runs the app in-process on sqlite with N concurrent login loops and M concurrent
+read loops for a fixed duration, once per hashing mode:
+
+  - threadpool: PASSWORD_HASH_WORKERS=0, Argon2 on the shared request threadpool
+  - pool:       Argon2 on the dedicated process pool
+
+Usage:
+    python -m loadtest.bench.login_throughput --duration 10 --logins 16 --readers 16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from . import common
+
+
+async def _loop(fn, stop_at, latencies, errors):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        res = await fn()
+        if res.status_code >= 400:
+            errors.append(res.status_code)
+        else:
+            latencies.append(time.perf_counter() - start)
+
+
+async def run_once(args):
+    db_path = common.configure_env()
+    common.reset_database(db_path)
+
+    from app.main import app
+    from app import utils
+
+    async with common.asgi_client(app) as client:
+        headers = await common.signup_and_login(client, "reader@bench.local")
+        await common.signup_and_login(client, "login@bench.local")
+        for i in range(args.tasks):
+            await client.post("/tasks/", headers=headers, json={"title": f"task {i}", "content": "bench"})
+
+        login_lat, read_lat, login_err, read_err = [], [], [], []
+        stop_at = time.perf_counter() + args.duration
+
+        def do_login():
+            return client.post("/login", data={"username": "login@bench.local",
+                                               "password": "bench-password"})
+
+        def do_read():
+            return client.get("/tasks/", headers=headers)
+
+        loops = [_loop(do_login, stop_at, login_lat, login_err) for _ in range(args.logins)]
+        loops += [_loop(do_read, stop_at, read_lat, read_err) for _ in range(args.readers)]
+        with common.Timer() as timer:
+            await asyncio.gather(*loops)
+
+    utils.shutdown_executor()
+    return {
+        "hash_workers": int(os.environ.get("PASSWORD_HASH_WORKERS", "2")),
+        "login": {**common.summarize(login_lat, timer.elapsed), "errors": len(login_err)},
+        "tasks_read": {**common.summarize(read_lat, timer.elapsed), "errors": len(read_err)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login loops")
+    parser.add_argument("--readers", type=int, default=16, help="concurrent GET /tasks/ loops")
+    parser.add_argument("--tasks", type=int, default=50, help="tasks seeded for the reader")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="hash pool size for the 'pool' run")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(asyncio.run(run_once(args))))
+        return
+
+    # each mode runs in a fresh interpreter so settings are read from a clean env
+    results = {}
+    for mode, workers in (("threadpool", 0), ("pool", args.workers)):
+        env = {**os.environ, "PASSWORD_HASH_WORKERS": str(workers)}
+        out = subprocess.run([sys.executable, "-m", "loadtest.bench.login_throughput", "--single",
+                              "--duration", str(args.duration), "--logins", str(args.logins),
+                              "--readers", str(args.readers), "--tasks", str(args.tasks)],
+                             env=env, check=True, capture_output=True, text=True)
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# loadtest/bench/queue_routing.py
+"""
+Reminder latency while batch work saturates the workers: one shared queue vs the
+interactive/batch split from app/celery_app.py (TASK_ROUTES).
+
+Runs real Celery workers (thread pool, started in this process with
+celery.contrib.testing) on the in-memory broker against a seeded sqlite database.
+The reminder "email" is a sleep of --notify-ms, an overdue-scan chunk a sleep of
+--chunk-ms (what both mostly do: wait on I/O).
+
+Load: --chunks process_overdue_range messages are queued first, like the fan-out of a
+big overdue scan, then a reminder is published every --interval-ms while they run, like
+users clicking "remind" in the meantime. Reported per mode:
+
+  - reminders: publish -> delivered latency (includes --notify-ms)
+  - batch:     how long the chunk backlog took to drain
+
+  - shared: every message on one queue, one worker with --concurrency threads
+  - routed: the app's routing, an interactive worker with --interactive threads and a
+            batch/sync worker with the rest (same total)
+
+The memory broker ignores priorities, so this measures the queue split only. On
+RabbitMQ the priorities also order messages inside each queue.
+
+Usage:
+    python -m loadtest.bench.queue_routing --chunks 200 --chunk-ms 50 --reminders 40 --concurrency 4
+"""
+
+import argparse
+import contextlib
+import json
+import time
+
+from . import common
+
+NOTIFY_SECONDS = 0.0
+CHUNK_SECONDS = 0.0
+SHARED_QUEUE = "shared"
+
+_delivered = {}
+_chunks_done = []
+
+
+def _slow_delivery(task, user):
+    time.sleep(NOTIFY_SECONDS)
+    _delivered[task.id] = time.perf_counter()
+    return {"status": "success", "task_id": task.id, "user_id": user.id}
+
+
+def _slow_chunk(db, low_id, high_id, since, until):
+    time.sleep(CHUNK_SECONDS)
+    _chunks_done.append(time.perf_counter())
+    return {"owners": 0, "overdue": 0}
+
+
+def _patch_tasks(notify_seconds, chunk_seconds):
+    global NOTIFY_SECONDS, CHUNK_SECONDS
+    NOTIFY_SECONDS, CHUNK_SECONDS = notify_seconds, chunk_seconds
+    import app.celery_app  # noqa: F401  the configured Celery app, before the tasks
+    from app import tasks
+    tasks._deliver_reminder = _slow_delivery
+    tasks._summarize_overdue_range = _slow_chunk
+
+
+def seed(count):
+    from app import database, models
+    with database.SessionLocal() as db:
+        user = models.User(email="queues@bench.local", password="not-a-real-hash")
+        db.add(user)
+        db.flush()
+        db.add_all(models.Task(title=f"task {i}", content="bench", owner_id=user.id)
+                   for i in range(count))
+        db.commit()
+        task_ids = [task_id for (task_id,) in db.query(models.Task.id).all()]
+        return user.id, task_ids
+
+
+def _workers(mode, concurrency, interactive):
+    """(queues, threads) per worker for a mode."""
+    from app import dispatch
+    if mode == "shared":
+        return [([SHARED_QUEUE], concurrency)]
+    return [([dispatch.INTERACTIVE], interactive),
+            ([dispatch.BATCH, dispatch.SYNC], concurrency - interactive)]
+
+
+def run(mode, args, user_id, task_ids):
+    from celery.contrib.testing.worker import start_worker
+    from app import database, dispatch
+    celery = dispatch._celery()
+    queue = SHARED_QUEUE if mode == "shared" else None
+    _delivered.clear()
+    _chunks_done.clear()
+
+    with contextlib.ExitStack() as stack:
+        for queues, threads in _workers(mode, args.concurrency, args.interactive):
+            stack.enter_context(start_worker(celery, concurrency=threads, pool="threads", queues=queues,
+                                             hostname=f"{'-'.join(queues)}@bench",
+                                             perform_ping_check=False, shutdown_timeout=30))
+        # worker_init sized the engine per worker; they share it here
+        database.configure_engine(pool_size=args.concurrency, max_overflow=0)
+
+        until = "2030-01-01T00:00:00+00:00"
+        start = time.perf_counter()
+        dispatch.send_group("process_overdue_range",
+                            [{"low_id": i, "high_id": i, "since": None, "until": until}
+                             for i in range(args.chunks)],
+                            queue=queue)
+
+        published = {}
+        for task_id in task_ids[:args.reminders]:
+            published[task_id] = time.perf_counter()
+            dispatch.send("send_task_reminder", {"task_id": task_id, "user_id": user_id},
+                          queue=queue or dispatch.INTERACTIVE)
+            time.sleep(args.interval_ms / 1000)
+        publishing = time.perf_counter() - min(published.values()) if published else 0.0
+
+        deadline = time.perf_counter() + args.timeout
+        while (len(_delivered) < len(published) or len(_chunks_done) < args.chunks) \
+                and time.perf_counter() < deadline:
+            time.sleep(0.01)
+
+    latencies = [_delivered[task_id] - sent for task_id, sent in published.items() if task_id in _delivered]
+    batch_seconds = (max(_chunks_done) - start) if _chunks_done else 0.0
+    return {"mode": mode,
+            "workers": [{"queues": queues, "threads": threads}
+                        for queues, threads in _workers(mode, args.concurrency, args.interactive)],
+            "reminders": common.summarize(latencies, publishing),
+            "reminders_lost": len(published) - len(latencies),
+            "batch": {"chunks": len(_chunks_done), "seconds": round(batch_seconds, 2)}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["shared", "routed"], choices=["shared", "routed"])
+    parser.add_argument("--chunks", type=int, default=200, help="batch messages queued up front")
+    parser.add_argument("--chunk-ms", type=float, default=50.0, help="simulated chunk work")
+    parser.add_argument("--reminders", type=int, default=40)
+    parser.add_argument("--interval-ms", type=float, default=50.0, help="time between reminders")
+    parser.add_argument("--notify-ms", type=float, default=20.0, help="simulated email latency")
+    parser.add_argument("--concurrency", type=int, default=4, help="worker threads in total")
+    parser.add_argument("--interactive", type=int, default=1, help="of those, on the interactive queue")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+    if not 0 < args.interactive < args.concurrency:
+        parser.error("--interactive must leave at least one thread for the batch worker")
+
+    db_path = common.configure_env()
+    common.reset_database(db_path)
+    user_id, task_ids = seed(args.reminders)
+    _patch_tasks(args.notify_ms / 1000, args.chunk_ms / 1000)
+
+    from app import dispatch
+    # Memory-broker artefacts, not what RabbitMQ does: empty queues are polled (once a
+    # second by default), and acks from pool threads only go out between 2s polls, so
+    # with acks_late + prefetch 1 a thread would get a new message every 2s. Ack on
+    # receipt with a deep prefetch instead: the worker still runs messages in queue order.
+    dispatch._celery().conf.update(broker_transport_options={"polling_interval": 0.01},
+                                   task_acks_late=False, worker_prefetch_multiplier=1000)
+
+    print(json.dumps([run(mode, args, user_id, task_ids) for mode in args.modes], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# loadtest/bench/serialization.py
+"""
+GET /tasks/ serialization: ORM + Pydantic (the old path) vs column rows + orjson.
+
+For each size in --rows it loads that many of one user's tasks and turns them into
+TaskPage JSON bytes three ways:
+
+  - orm_pydantic: select(Task) -> ORM objects -> TaskPage validation (from_attributes)
+                  -> model_dump_json, which is what response_model=TaskPage does
+  - rows_orjson:  select(<TaskResponse columns>) -> tuples -> serialization.encode_page
+  - rows_fields:  same, with ?fields=id,title,completed (content is never loaded)
+
+fetch_ms is the query + building rows/objects, encode_ms the JSON step, both medians
+over --repeat runs. The two full outputs are compared, so a mismatch fails loudly.
+
+Usage:
+    python -m loadtest.bench.serialization --rows 1000 10000 100000 --content-chars 400
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from . import common
+
+
+def seed(count, content_chars):
+    from sqlalchemy import insert
+    from app import database, models
+    with database.SessionLocal() as db:
+        user = models.User(email="serializer@bench.local", password="not-a-real-hash")
+        db.add(user)
+        db.flush()
+        content = ("lorem ipsum " * (content_chars // 12 + 1))[:content_chars]
+        db.execute(insert(models.Task), [
+            {"title": f"task {i}", "content": content, "completed": i % 3 == 0, "owner_id": user.id}
+            for i in range(count)])
+        db.commit()
+        return user.id
+
+
+def orm_pydantic(db, owner_id, limit):
+    from sqlalchemy import select
+    from app import models, schemas
+    start = time.perf_counter()
+    tasks = db.scalars(select(models.Task).where(models.Task.owner_id == owner_id)
+                       .order_by(models.Task.id).limit(limit)).all()
+    fetched = time.perf_counter()
+    body = schemas.TaskPage.model_validate({"items": tasks, "next_cursor": None}).model_dump_json().encode()
+    return body, fetched - start, time.perf_counter() - fetched
+
+
+def rows_orjson(db, owner_id, limit, fields=None):
+    from sqlalchemy import select
+    from app import models, serialization
+    columns = serialization.parse_fields(fields)
+    start = time.perf_counter()
+    rows = db.execute(select(*(getattr(models.Task, name) for name in columns))
+                      .where(models.Task.owner_id == owner_id)
+                      .order_by(models.Task.id).limit(limit)).all()
+    fetched = time.perf_counter()
+    body = serialization.encode_page(columns, rows, None)
+    return body, fetched - start, time.perf_counter() - fetched
+
+
+def measure(fn, repeat):
+    from app import database
+    fetch, encode = [], []
+    for _ in range(repeat):
+        # a fresh session each run, like a request: no identity map carried over
+        with database.SessionLocal() as db:
+            body, fetch_s, encode_s = fn(db)
+        fetch.append(fetch_s)
+        encode.append(encode_s)
+    fetch_ms = statistics.median(fetch) * 1000
+    encode_ms = statistics.median(encode) * 1000
+    return body, {"fetch_ms": round(fetch_ms, 2), "encode_ms": round(encode_ms, 2),
+                  "total_ms": round(fetch_ms + encode_ms, 2), "bytes": len(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--content-chars", type=int, default=400, help="size of each task's content")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = common.configure_env()
+    common.reset_database(db_path)
+    owner_id = seed(max(args.rows), args.content_chars)
+
+    results = []
+    for count in args.rows:
+        old_body, old = measure(lambda db: orm_pydantic(db, owner_id, count), args.repeat)
+        new_body, new = measure(lambda db: rows_orjson(db, owner_id, count), args.repeat)
+        _, fields = measure(lambda db: rows_orjson(db, owner_id, count, "id,title,completed"), args.repeat)
+        if json.loads(old_body) != json.loads(new_body):
+            raise SystemExit(f"rows_orjson output differs from TaskPage at {count} rows")
+        results.append({"rows": count, "orm_pydantic": old, "rows_orjson": new, "rows_fields": fields,
+                        "speedup": round(old["total_ms"] / new["total_ms"], 2),
+                        "speedup_fields": round(old["total_ms"] / fields["total_ms"], 2)})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
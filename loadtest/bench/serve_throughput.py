@@ -0,0 +1,156 @@
+# loadtest/bench/serve_throughput.py
+"""
+Requests per second through `python -m app.serve` with 1 worker vs N workers.
+
+Starts the launcher on a local port for each --workers value (sqlite database, seeded
+once), waits until every worker is serving, then runs --clients load processes for
+--duration seconds. Each client process keeps --connections requests in flight on
+the routes the in-process suite uses most:
+
+  - GET /health            (no auth, no DB: the server + framework overhead)
+  - GET /tasks/?limit=50   (JWT + user lookup + one query + serialization)
+
+The load generators run on the same machine, so leave them CPU: on a host with C
+cores, compare 1 worker with about C/2 workers rather than C.
+
+Usage:
+    python -m loadtest.bench.serve_throughput --workers 1 4 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import common
+
+ROUTES = {
+    "GET /health": "/health",
+    "GET /tasks/": "/tasks/?limit=50",
+}
+
+
+def seed(task_count):
+    from sqlalchemy import insert
+    from app import database, models, oauth2
+    with database.SessionLocal() as db:
+        user = models.User(email="serve@bench.local", password="not-a-real-hash")
+        db.add(user)
+        db.flush()
+        db.execute(insert(models.Task), [{"title": f"task {i}", "content": "bench", "owner_id": user.id}
+                                         for i in range(task_count)])
+        db.commit()
+        return oauth2.create_access_token({"user_id": user.id})
+
+
+def start_server(workers, port):
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen([sys.executable, "-m", "app.serve", "--workers", str(workers),
+                                "--host", "127.0.0.1", "--port", str(port), "--no-access-log"],
+                               env=os.environ.copy(), stdout=subprocess.DEVNULL, stderr=log)
+    # the master logs "Serving on" once every worker is accepting connections
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        log.seek(0)
+        output = log.read().decode(errors="replace")
+        if process.poll() is not None:
+            raise RuntimeError(f"app.serve exited: {output[-2000:]}")
+        if "Serving on" in output:
+            return process
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("app.serve did not start in 60s")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def _client(url, headers, connections, duration):
+    import httpx
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        stop_at = time.perf_counter() + duration
+
+        async def loop():
+            nonlocal errors
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                try:
+                    res = await client.get(url, headers=headers)
+                    ok = res.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(loop() for _ in range(connections)))
+    return latencies, errors
+
+
+def _client_process(url, headers, connections, duration, queue):
+    queue.put(asyncio.run(_client(url, headers, connections, duration)))
+
+
+def load(url, headers, clients, connections, duration):
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_client_process, args=(url, headers, connections, duration, queue))
+                 for _ in range(clients)]
+    with common.Timer() as timer:
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+    latencies = [value for values, _ in results for value in values]
+    return {**common.summarize(latencies, timer.elapsed), "errors": sum(errors for _, errors in results)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, max((os.cpu_count() or 2) // 2, 2)])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--connections", type=int, default=32, help="requests in flight per client")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    db_path = common.configure_env()
+    common.reset_database(db_path)
+    headers = {"Authorization": f"Bearer {seed(args.tasks)}"}
+
+    results = []
+    for workers in args.workers:
+        process = start_server(workers, args.port)
+        try:
+            row = {"workers": workers}
+            for name, path in ROUTES.items():
+                row[name] = load(f"http://127.0.0.1:{args.port}{path}", headers,
+                                 args.clients, args.connections, args.duration)
+            results.append(row)
+        finally:
+            stop_server(process)
+
+    base = results[0]
+    for row in results[1:]:
+        row["speedup"] = {name: round(row[name]["rps"] / base[name]["rps"], 2) if base[name]["rps"] else None
+                          for name in ROUTES}
+    print(json.dumps({"cpus": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
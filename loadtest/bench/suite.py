@@ -0,0 +1,405 @@
+# loadtest/bench/suite.py
+"""
+Benchmark every API route and every Celery task in-process, compare with a baseline.
+
+The app runs over an ASGI transport on sqlite (no sockets, no Docker) with Celery in
+eager mode, so a queued job runs inline like a worker would run it. For each scenario:
+
+  - latency p50/p95/p99 and throughput, --requests calls at --concurrency
+  - SQL statements per call, counted over a few sequential calls first
+
+Results are JSON. With --baseline the run is compared against a stored result and the
+exit code is 1 on a regression: more SQL statements than the baseline, or a p95 more
+than --tolerance slower (and at least --noise-ms, so tiny routes don't flap).
+Both depend on the seed and the load (a smaller seed changes which ids a bulk call
+touches, and so its statements), so a run made with other --users, --tasks-per-user,
+--requests, --concurrency, --sql-samples or DATABASE_MODE than the baseline is not
+compared at all: exit code 2.
+
+Usage:
+    python -m loadtest.bench.suite --users 5 --tasks-per-user 2000 --output bench.json
+    python -m loadtest.bench.suite --baseline loadtest/bench/baseline.json
+    python -m loadtest.bench.suite --save-baseline loadtest/bench/baseline.json
+    python -m loadtest.bench.suite --only "GET /tasks/" --only search
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from . import common
+
+PASSWORD = "bench-password"
+WORDS = ["groceries", "invoice", "deploy", "review", "meeting", "report", "backup",
+         "release", "budget", "email", "design", "refactor", "dentist", "travel", "gym"]
+
+
+# ---------------------------------
+# SQL STATEMENT COUNTER
+# ---------------------------------
+
+class StatementCounter:
+    """Counts every statement any engine sends (sync engines, and the ones behind async engines)."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def install(self):
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        event.listen(Engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        with self._lock:
+            self.count += 1
+
+
+# ---------------------------------
+# SEEDING
+# ---------------------------------
+
+def seed(users, tasks_per_user, chunk_size=5000):
+    """Users share one password hash; tasks get searchable titles, some done, some overdue."""
+    from sqlalchemy import insert
+    from app import database, models, utils
+
+    rng = random.Random(42)
+    password_hash = utils.hash(PASSWORD)
+    now = datetime.now(timezone.utc)
+
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"user{i}@bench.local", "password": password_hash} for i in range(users)])
+        user_ids = [row.id for row in conn.execute(models.User.__table__.select().order_by(models.User.id))]
+
+        rows = []
+        for owner_id in user_ids:
+            for n in range(tasks_per_user):
+                words = rng.sample(WORDS, 3)
+                rows.append({
+                    "owner_id": owner_id,
+                    "title": f"{words[0]} {words[1]} #{n}",
+                    "content": f"remember the {words[2]} before the {words[0]}",
+                    "completed": rng.random() < 0.4,
+                    "due_date": now + timedelta(hours=rng.randint(-72, 72)) if rng.random() < 0.5 else None,
+                })
+                if len(rows) >= chunk_size:
+                    conn.execute(insert(models.Task), rows)
+                    rows = []
+        if rows:
+            conn.execute(insert(models.Task), rows)
+
+    # the counters behind GET /tasks/stats, filled the same way drift is repaired
+    from app.tasks import reconcile_task_stats
+    reconcile_task_stats.apply()
+    return user_ids
+
+
+# ---------------------------------
+# SCENARIOS
+# ---------------------------------
+
+class Context:
+    """What the scenarios share: auth headers, ids to work on, ids created along the way."""
+
+    def __init__(self, headers, other_headers, task_ids):
+        self.headers = headers
+        self.other_headers = other_headers
+        self.task_ids = task_ids
+        self.created = []       # POST /tasks/ -> DELETE /tasks/{id}
+        self.bulk_created = []  # POST /tasks/bulk -> POST /tasks/bulk/delete
+        self.job_ids = []       # POST /tasks/{id}/remind -> GET /jobs/{id}
+        self.fresh = itertools.count()
+
+    def task_id(self, i):
+        return self.task_ids[i % len(self.task_ids)]
+
+
+def http_scenarios(ctx):
+    """name -> function(i) returning (method, url, request kwargs, on_response or None)."""
+    h = ctx.headers
+    body = {"title": "bench task", "content": "created by the benchmark"}
+
+    def remember(target):
+        return lambda res: target.append(res.json()["id"])
+
+    def remember_many(target):
+        return lambda res: target.extend(item["id"] for item in res.json()["results"])
+
+    def remember_job(res):
+        ctx.job_ids.append(res.json()["task_id"])
+
+    return {
+        "GET /": lambda i: ("GET", "/", {}, None),
+        "GET /health": lambda i: ("GET", "/health", {}, None),
+        "GET /health/pool": lambda i: ("GET", "/health/pool", {}, None),
+        "POST /users/": lambda i: ("POST", "/users/", {"json": {
+            "email": f"new{next(ctx.fresh)}@bench.local", "password": PASSWORD}}, None),
+        "POST /login": lambda i: ("POST", "/login", {"data": {
+            "username": "user0@bench.local", "password": PASSWORD}}, None),
+        "POST /tasks/": lambda i: ("POST", "/tasks/", {"headers": h, "json": body}, remember(ctx.created)),
+        "GET /tasks/": lambda i: ("GET", "/tasks/", {"headers": h}, None),
+        "GET /tasks/ (304)": lambda i: ("GET", "/tasks/", {"headers": {**h, "If-None-Match": ctx.list_etag}}, None),
+        "GET /tasks/ (filtered, page 2)": lambda i: (
+            "GET", f"/tasks/?completed=false&limit=50&cursor={ctx.second_page}", {"headers": h}, None),
+        "GET /tasks/ (fields)": lambda i: ("GET", "/tasks/?fields=title,completed&limit=1000", {"headers": h}, None),
+        "GET /tasks/stats": lambda i: ("GET", "/tasks/stats", {"headers": h}, None),
+        "GET /tasks/search": lambda i: ("GET", f"/tasks/search?q={WORDS[i % len(WORDS)]}", {"headers": h}, None),
+        "GET /tasks/export (ndjson)": lambda i: ("GET", "/tasks/export?format=ndjson", {"headers": h}, None),
+        "GET /tasks/export (csv)": lambda i: ("GET", "/tasks/export?format=csv", {"headers": h}, None),
+        "GET /tasks/{id}": lambda i: ("GET", f"/tasks/{ctx.task_id(i)}", {"headers": h}, None),
+        "GET /tasks/{id} (403)": lambda i: ("GET", f"/tasks/{ctx.task_id(i)}", {"headers": ctx.other_headers}, None),
+        "PUT /tasks/{id}": lambda i: ("PUT", f"/tasks/{ctx.task_id(i)}", {"headers": h, "json": {
+            **body, "completed": i % 2 == 0}}, None),
+        "DELETE /tasks/{id}": lambda i: ("DELETE", f"/tasks/{ctx.created.pop()}", {"headers": h}, None),
+        "POST /tasks/bulk": lambda i: ("POST", "/tasks/bulk", {"headers": h, "json": [body] * 10},
+                                       remember_many(ctx.bulk_created)),
+        "PATCH /tasks/bulk": lambda i: ("PATCH", "/tasks/bulk", {"headers": h, "json": [
+            {"id": ctx.task_id(i * 10 + n), "completed": (i + n) % 2 == 0} for n in range(10)]}, None),
+        "POST /tasks/bulk/delete": lambda i: ("POST", "/tasks/bulk/delete", {"headers": h, "json": {
+            "ids": [ctx.bulk_created.pop() for _ in range(10)]}}, None),
+        "POST /tasks/{id}/remind": lambda i: ("POST", f"/tasks/{ctx.task_id(i)}/remind", {"headers": h},
+                                              remember_job),
+        "POST /tasks/remind": lambda i: ("POST", "/tasks/remind", {"headers": h, "json": {
+            "task_ids": [ctx.task_id(i * 50 + n) for n in range(50)]}}, None),
+        "GET /jobs/{id}": lambda i: ("GET", f"/jobs/{ctx.job_ids[i % len(ctx.job_ids)]}", {"headers": h}, None),
+    }
+
+
+def task_scenarios(ctx, user_id):
+    """name -> function(i) running one Celery task the way a worker would (eager apply)."""
+    from app import tasks
+
+    low, high = min(ctx.task_ids), max(ctx.task_ids)
+    return {
+        "task send_task_reminder": lambda i: tasks.send_task_reminder.apply(
+            kwargs={"task_id": ctx.task_id(i), "user_id": user_id}),
+        "task send_task_reminders_batch": lambda i: tasks.send_task_reminders_batch.apply(
+            kwargs={"task_ids": [ctx.task_id(i * 100 + n) for n in range(100)], "user_id": user_id}),
+        "task mark_overdue_tasks": lambda i: tasks.mark_overdue_tasks.apply(),
+        "task process_overdue_range": lambda i: tasks.process_overdue_range.apply(
+            args=(low, high, None, datetime.now(timezone.utc).isoformat())),
+        "task reconcile_task_stats": lambda i: tasks.reconcile_task_stats.apply(),
+        "task sync_task_metadata": lambda i: tasks.sync_task_metadata.apply(args=(ctx.task_id(i),)),
+    }
+
+
+# ---------------------------------
+# RUNNER
+# ---------------------------------
+
+async def _call_http(client, spec, expected_error=None):
+    method, url, kwargs, on_response = spec
+    start = time.perf_counter()
+    res = await client.request(method, url, **kwargs)
+    elapsed = time.perf_counter() - start
+    if res.status_code >= 400 and res.status_code != expected_error:
+        raise RuntimeError(f"{method} {url} -> {res.status_code} {res.text[:200]}")
+    if on_response:
+        on_response(res)
+    return elapsed
+
+
+async def _call_task(fn, i):
+    from starlette.concurrency import run_in_threadpool
+    start = time.perf_counter()
+    result = await run_in_threadpool(fn, i)
+    if result.failed():
+        raise RuntimeError(f"task failed: {result.result!r}")
+    return time.perf_counter() - start
+
+
+async def measure(call, counter, requests, concurrency, sql_samples):
+    """Warm up once, count statements over sql_samples sequential calls, then time the rest."""
+    index = itertools.count()
+    await call(next(index))
+
+    before = counter.count
+    for _ in range(sql_samples):
+        await call(next(index))
+    statements = (counter.count - before) / sql_samples if sql_samples else None
+
+    latencies = []
+
+    async def loop():
+        while True:
+            i = next(index)
+            if i > requests + sql_samples:
+                return
+            latencies.append(await call(i))
+
+    with common.Timer() as timer:
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+
+    return {**common.summarize(latencies, timer.elapsed), "statements": statements}
+
+
+def _wants(name, only):
+    return not only or any(pattern.lower() in name.lower() for pattern in only)
+
+
+async def run_suite(args):
+    db_path = common.configure_env()
+    common.reset_database(db_path)
+
+    from app.celery_app import celery_app
+    # eager: a published job runs right here, the same code path as on a worker
+    celery_app.conf.update(task_always_eager=True, task_eager_propagates=True)
+
+    from app.main import app
+    from app import database, utils
+
+    counter = StatementCounter()
+    counter.install()
+
+    with common.Timer() as seed_timer:
+        user_ids = seed(args.users, args.tasks_per_user)
+
+    results = {}
+    async with common.asgi_client(app) as client:
+        headers = await _login(client, "user0@bench.local")
+        other_headers = await _login(client, "user1@bench.local") if args.users > 1 else headers
+
+        from app import models
+        with database.SessionLocal() as db:
+            task_ids = [task_id for (task_id,) in db.query(models.Task.id).filter(
+                models.Task.owner_id == user_ids[0]).order_by(models.Task.id)]
+        ctx = Context(headers, other_headers, task_ids)
+
+        first = await client.get("/tasks/?completed=false&limit=50", headers=headers)
+        ctx.second_page = first.json()["next_cursor"] or ""
+        ctx.list_etag = (await client.get("/tasks/", headers=headers)).headers["etag"]
+
+        for name, build in http_scenarios(ctx).items():
+            if not _wants(name, args.only):
+                continue
+            if name == "GET /tasks/ (304)":
+                # earlier writes bumped the version, take a fresh ETag
+                ctx.list_etag = (await client.get("/tasks/", headers=headers)).headers["etag"]
+            # hashing routes are slow by design (Argon2), fewer calls is enough
+            requests = args.requests if name not in ("POST /users/", "POST /login") else max(args.requests // 5, 5)
+            expected_error = 403 if name.endswith("(403)") else None
+            results[name] = await measure(lambda i, build=build, e=expected_error: _call_http(client, build(i), e),
+                                          counter, requests, args.concurrency, args.sql_samples)
+            print(f"{name:36} {json.dumps(results[name])}", file=sys.stderr)
+
+        for name, fn in task_scenarios(ctx, user_ids[0]).items():
+            if not _wants(name, args.only):
+                continue
+            # a worker process runs one task at a time
+            results[name] = await measure(lambda i, fn=fn: _call_task(fn, i),
+                                          counter, max(args.requests // 5, 5), 1, args.sql_samples)
+            print(f"{name:36} {json.dumps(results[name])}", file=sys.stderr)
+
+    utils.shutdown_executor()
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            **run_parameters(args),
+            "seed_seconds": round(seed_timer.elapsed, 2),
+        },
+        "scenarios": results,
+    }
+
+
+async def _login(client, email):
+    res = await client.post("/login", data={"username": email, "password": PASSWORD})
+    res.raise_for_status()
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+# ---------------------------------
+# BASELINE COMPARISON
+# ---------------------------------
+
+def run_parameters(args):
+    """What decides the numbers besides the code: a baseline only compares with the same ones."""
+    common.configure_env()
+    from app.config import settings
+    return {"database_mode": settings.database_mode, "users": args.users, "tasks_per_user": args.tasks_per_user,
+            "requests": args.requests, "concurrency": args.concurrency, "sql_samples": args.sql_samples}
+
+
+def mismatched_parameters(parameters, baseline):
+    """List of "<parameter>: <this run> vs baseline <value>" (empty = comparable)."""
+    recorded = baseline.get("meta", {})
+    return [f"{key}: {value} vs baseline {recorded.get(key)}"
+            for key, value in parameters.items() if recorded.get(key) != value]
+
+
+def compare(current, baseline, tolerance, noise_ms):
+    """List of regression messages (empty = ok). Scenarios missing on either side are skipped."""
+    regressions = []
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        if now["statements"] is not None and before.get("statements") is not None \
+                and now["statements"] > before["statements"]:
+            regressions.append(f"{name}: {now['statements']} SQL statements per call, baseline {before['statements']}")
+        limit = before["p95_ms"] * (1 + tolerance)
+        if now["p95_ms"] > limit and now["p95_ms"] - before["p95_ms"] > noise_ms:
+            regressions.append(f"{name}: p95 {now['p95_ms']}ms, baseline {before['p95_ms']}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--tasks-per-user", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200, help="timed calls per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--sql-samples", type=int, default=3, help="sequential calls used to count SQL")
+    parser.add_argument("--only", action="append", help="run scenarios whose name contains this (repeatable)")
+    parser.add_argument("--output", help="write the JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="compare with this results file, exit 1 on regression")
+    parser.add_argument("--save-baseline", help="write the results here as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed p95 slowdown, 0.5 = +50%%")
+    parser.add_argument("--noise-ms", type=float, default=2.0, help="ignore p95 changes smaller than this")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # checked before running: a comparison across parameters would flag noise as regressions
+        mismatched = mismatched_parameters(run_parameters(args), baseline)
+        if mismatched:
+            for message in mismatched:
+                print(f"NOT COMPARABLE {message}", file=sys.stderr)
+            print("run with the baseline's parameters or record a new one (--save-baseline)", file=sys.stderr)
+            sys.exit(2)
+
+    results = asyncio.run(run_suite(args))
+    text = json.dumps(results, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(text + "\n")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance, args.noise_ms)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("no regressions against the baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
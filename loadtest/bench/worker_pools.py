@@ -0,0 +1,109 @@
+# loadtest/bench/worker_pools.py
+"""
+Reminder throughput for a process pool (prefork) vs a thread pool.
+
+Runs send_task_reminder against a seeded sqlite database with the "email" replaced by
+a sleep of --notify-ms, which is what the real task mostly does: wait on I/O.
+
+  - prefork: N forked processes, each runs the worker_process_init hook from
+             app/celery_app.py (own engine, pool_size=1) and one task at a time
+  - threads: N threads in one process sharing one engine sized to N connections
+
+This drives the tasks with concurrent.futures instead of a broker, so it measures the
+execution model and the DB pools, not RabbitMQ. Fork only, so Linux/macOS.
+
+Usage:
+    python -m loadtest.bench.worker_pools --reminders 400 --concurrency 2 8 32
+"""
+
+import argparse
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from . import common
+
+NOTIFY_SECONDS = 0.0
+
+
+def _slow_delivery(task, user):
+    time.sleep(NOTIFY_SECONDS)
+    return {"status": "success", "task_id": task.id, "user_id": user.id}
+
+
+def _patch_delivery(notify_seconds):
+    global NOTIFY_SECONDS
+    NOTIFY_SECONDS = notify_seconds
+    import app.celery_app  # noqa: F401  the configured Celery app, before the tasks
+    from app import tasks
+    tasks._deliver_reminder = _slow_delivery
+
+
+def _child_init(notify_seconds):
+    from app.celery_app import _init_child_db
+    _patch_delivery(notify_seconds)
+    _init_child_db()
+
+
+def _remind(task_id, user_id):
+    from app.tasks import send_task_reminder
+    start = time.perf_counter()
+    result = send_task_reminder.apply(kwargs={"task_id": task_id, "user_id": user_id})
+    if result.failed():
+        raise RuntimeError(f"reminder for task {task_id} failed: {result.result!r}")
+    return time.perf_counter() - start
+
+
+def seed(count):
+    from app import database, models
+    with database.SessionLocal() as db:
+        user = models.User(email="worker@bench.local", password="not-a-real-hash")
+        db.add(user)
+        db.flush()
+        db.add_all(models.Task(title=f"task {i}", content="bench", owner_id=user.id)
+                   for i in range(count))
+        db.commit()
+        task_ids = [task_id for (task_id,) in db.query(models.Task.id).all()]
+        return user.id, task_ids
+
+
+def run(pool_name, concurrency, user_id, task_ids, notify_seconds):
+    from app import database
+    if pool_name == "prefork":
+        executor = ProcessPoolExecutor(concurrency, mp_context=multiprocessing.get_context("fork"),
+                                       initializer=_child_init, initargs=(notify_seconds,))
+    else:
+        # what worker_init does for --pool=threads
+        database.configure_engine(pool_size=concurrency, max_overflow=0)
+        executor = ThreadPoolExecutor(concurrency)
+
+    with executor:
+        # start the workers before the clock, like a running worker would be
+        list(executor.map(time.sleep, [0] * concurrency))
+        with common.Timer() as timer:
+            latencies = list(executor.map(_remind, task_ids, [user_id] * len(task_ids)))
+
+    return {"pool": pool_name, "concurrency": concurrency, **common.summarize(latencies, timer.elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reminders", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[2, 8, 32])
+    parser.add_argument("--notify-ms", type=float, default=20.0, help="simulated email latency")
+    args = parser.parse_args()
+
+    db_path = common.configure_env()
+    common.reset_database(db_path)
+    user_id, task_ids = seed(args.reminders)
+    _patch_delivery(args.notify_ms / 1000)
+
+    results = [run(pool_name, concurrency, user_id, task_ids, args.notify_ms / 1000)
+               for concurrency in args.concurrency
+               for pool_name in ("prefork", "threads")]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
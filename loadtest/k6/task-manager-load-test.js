@@ -1,5 +1,13 @@
 import http from 'k6/http';
 import { check, sleep } from 'k6';
+import { Rate } from 'k6/metrics';
+
+// 429 (rate limit) / 503 (server busy) from app/admission.py are load shedding, not
+// failures: they don't count in http_req_failed, `shed` tracks how much was turned away.
+// Every VU uses the same ACCESS_TOKEN, so start the API with RATE_LIMIT_USER=off unless
+// the point of the run is that one user's rate limit.
+http.setResponseCallback(http.expectedStatuses({ min: 200, max: 399 }, 429, 503));
+const shed = new Rate('shed');
 
 export const options = {
 scenarios: {
@@ -25,6 +33,7 @@ scenarios: {
   thresholds: {
     http_req_failed: ['rate<0.05'],      // allow up to 5% errors
     http_req_duration: ['p(95)<2000'],   // loose threshold so it doesn't abort early
+    shed: ['rate<0.5'],                  // mostly served, even at the top of the ramp
   },
 };
 
@@ -54,14 +63,20 @@ export function authenticatedTaskFlow() {
   };
 
   const listRes = http.get(`${BASE_URL}/tasks/`, { headers });
+  shed.add(isShed(listRes));
   check(listRes, {
-    'tasks list returned 200': (r) => r.status === 200,
+    'tasks list returned 200 or was shed': (r) => r.status === 200 || isShed(r),
   });
 
   const taskRes = http.get(`${BASE_URL}/tasks/${TASK_ID}`, { headers });
+  shed.add(isShed(taskRes));
   check(taskRes, {
-    'single task returned 200': (r) => r.status === 200,
+    'single task returned 200 or was shed': (r) => r.status === 200 || isShed(r),
   });
 
   sleep(1);
 }
+
+function isShed(res) {
+  return res.status === 429 || res.status === 503;
+}